@@ -0,0 +1,319 @@
+"""
+Function-level benchmarks of src/feed/utils.py.
+
+Every function runs against seeded data sets of increasing size, so the
+numbers show how it scales with posts per user and reactions per post.
+Write benchmarks change the seeded rows only, which are removed afterwards.
+
+Usage:
+    python -m benchmarks.bench_feed_utils [--datasets small,medium,large]
+        [--iterations 100] [--only get_posts] [--output bench_feed_utils.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.seed import cleanup, seed
+from src.database import async_session_maker, dispose_engine
+from src.feed.cache import post_cache
+from src.feed.schemas import PostCreate, PostUpdate, ReactionOperation
+from src.feed.trending import trending_posts
+from src.feed.utils import (
+    apply_reactions_json,
+    create_dict_from_post_data,
+    create_post_json,
+    create_posts_json,
+    delete_post_json,
+    dislike_post_json,
+    edit_post_json,
+    export_posts_ndjson,
+    get_all_user_post_by_post_id,
+    get_likes_by_post_id_json,
+    get_likes_by_post_ids_json,
+    get_post_by_id,
+    get_post_by_post_id_json,
+    get_posts_by_user_id_json,
+    get_trending_posts_json,
+    like_post_json,
+    reconcile_reaction_counters,
+    remove_the_reaction_json,
+    view_post_json,
+)
+from src.utils import STATUS, return_json
+
+# users, posts per user, reactions per post
+DATASETS = {
+    "small": (10, 10, 5),
+    "medium": (50, 100, 25),
+    "large": (100, 500, 50),
+}
+PREFIX = "benchfeed"
+
+Benchmark = Callable[[dict, random.Random], Awaitable[None]]
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(function: Benchmark) -> Benchmark:
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def reader_and_post(data: dict, generator: random.Random):
+    """A random post and a random user who is not its author."""
+    post_id = generator.choice(data["post_ids"])
+    user_id = generator.choice(data["user_ids"])
+    while data["authors"][post_id] == user_id:
+        user_id = generator.choice(data["user_ids"])
+    return user_id, post_id
+
+
+@benchmark
+async def get_post_by_id_uncached(data: dict, generator: random.Random) -> None:
+    post_id = generator.choice(data["post_ids"])
+    post_cache.invalidate(post_id)
+    async with async_session_maker() as session:
+        await get_post_by_id(post_id=post_id, session=session)
+
+
+@benchmark
+async def get_post_by_id_cached(data: dict, generator: random.Random) -> None:
+    post_id = generator.choice(data["post_ids"][:10])
+    async with async_session_maker() as session:
+        await get_post_by_id(post_id=post_id, session=session)
+
+
+@benchmark
+async def get_post_by_post_id_json_uncached(
+    data: dict, generator: random.Random
+) -> None:
+    post_id = generator.choice(data["post_ids"])
+    post_cache.invalidate(post_id)
+    async with async_session_maker() as session:
+        await get_post_by_post_id_json(post_id=post_id, session=session)
+
+
+@benchmark
+async def get_posts_first_page(data: dict, generator: random.Random) -> None:
+    async with async_session_maker() as session:
+        await get_posts_by_user_id_json(
+            user_id=generator.choice(data["user_ids"]), session=session
+        )
+
+
+@benchmark
+async def get_posts_next_page(data: dict, generator: random.Random) -> None:
+    async with async_session_maker() as session:
+        first_page = await get_posts_by_user_id_json(
+            user_id=generator.choice(data["user_ids"]), session=session, limit=10
+        )
+        if first_page["next_cursor"] is not None:
+            await get_posts_by_user_id_json(
+                user_id=first_page["data"][0]["user_id"],
+                session=session,
+                limit=10,
+                cursor=first_page["next_cursor"],
+            )
+
+
+@benchmark
+async def get_trending_posts_refreshed(data: dict, generator: random.Random) -> None:
+    trending_posts.clear()
+    async with async_session_maker() as session:
+        await get_trending_posts_json(session=session)
+
+
+@benchmark
+async def export_posts(data: dict, generator: random.Random) -> None:
+    async for _ in export_posts_ndjson(user_id=generator.choice(data["user_ids"])):
+        pass
+
+
+@benchmark
+async def get_likes_by_post_id(data: dict, generator: random.Random) -> None:
+    async with async_session_maker() as session:
+        await get_likes_by_post_id_json(
+            post_id=generator.choice(data["post_ids"]), session=session
+        )
+
+
+@benchmark
+async def get_likes_by_100_post_ids(data: dict, generator: random.Random) -> None:
+    post_ids = generator.sample(data["post_ids"], min(100, len(data["post_ids"])))
+    async with async_session_maker() as session:
+        await get_likes_by_post_ids_json(post_ids=post_ids, session=session)
+
+
+@benchmark
+async def get_all_user_post(data: dict, generator: random.Random) -> None:
+    async with async_session_maker() as session:
+        await get_all_user_post_by_post_id(
+            post_id=generator.choice(data["post_ids"]), session=session
+        )
+
+
+@benchmark
+async def like_and_dislike_post(data: dict, generator: random.Random) -> None:
+    user_id, post_id = reader_and_post(data, generator)
+    async with async_session_maker() as session:
+        await like_post_json(post_id=post_id, user_id=user_id, session=session)
+        await dislike_post_json(post_id=post_id, user_id=user_id, session=session)
+
+
+@benchmark
+async def remove_the_reaction(data: dict, generator: random.Random) -> None:
+    user_id, post_id = reader_and_post(data, generator)
+    async with async_session_maker() as session:
+        await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+        await like_post_json(post_id=post_id, user_id=user_id, session=session)
+
+
+@benchmark
+async def apply_10_reactions(data: dict, generator: random.Random) -> None:
+    user_id = generator.choice(data["user_ids"])
+    operations = [
+        ReactionOperation(
+            post_id=post_id, action=generator.choice(("like", "dislike", "remove"))
+        )
+        for post_id in generator.sample(data["post_ids"], 10)
+    ]
+    async with async_session_maker() as session:
+        await apply_reactions_json(
+            operations=operations, user_id=user_id, session=session
+        )
+
+
+@benchmark
+async def view_post(data: dict, generator: random.Random) -> None:
+    user_id, post_id = reader_and_post(data, generator)
+    async with async_session_maker() as session:
+        await view_post_json(post_id=post_id, user_id=user_id, session=session)
+
+
+@benchmark
+async def create_edit_and_delete_post(data: dict, generator: random.Random) -> None:
+    user_id = generator.choice(data["user_ids"])
+    async with async_session_maker() as session:
+        await create_post_json(
+            post_to_create=PostCreate(title="Пост", text="Текст"),
+            user_id=user_id,
+            session=session,
+        )
+        page = await get_posts_by_user_id_json(
+            user_id=user_id, session=session, limit=1
+        )
+        post_id = page["data"][0]["id"]
+        await edit_post_json(
+            post_update=PostUpdate(id=post_id, title="Пост", text="Новый текст"),
+            user_id=user_id,
+            session=session,
+        )
+        await delete_post_json(post_id=post_id, user_id=user_id, session=session)
+
+
+@benchmark
+async def create_100_posts(data: dict, generator: random.Random) -> None:
+    async with async_session_maker() as session:
+        await create_posts_json(
+            posts_to_create=[{"title": "Пост", "text": "Текст"}] * 100,
+            user_id=generator.choice(data["user_ids"]),
+            session=session,
+        )
+
+
+@benchmark
+async def reconcile_100_posts(data: dict, generator: random.Random) -> None:
+    post_ids = generator.sample(data["post_ids"], min(100, len(data["post_ids"])))
+    async with async_session_maker() as session:
+        await reconcile_reaction_counters(session=session, post_ids=post_ids)
+
+
+@benchmark
+async def create_dict_and_return_json(data: dict, generator: random.Random) -> None:
+    post_id = generator.choice(data["post_ids"][:10])
+    async with async_session_maker() as session:
+        post_data = await get_post_by_id(post_id=post_id, session=session)
+    for _ in range(100):
+        return_json(status=STATUS[200], data=[create_dict_from_post_data(post_data)])
+
+
+def summarize(timings: List[float]) -> dict:
+    timings = sorted(timings)
+    return {
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "p95_ms": round(
+            timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3
+        ),
+    }
+
+
+async def run_dataset(name: str, iterations: int, only: List[str]) -> dict:
+    users, posts_per_user, reactions_per_post = DATASETS[name]
+    print(
+        f"Data set {name}: {users} users, {posts_per_user} posts per user, "
+        f"{reactions_per_post} reactions per post"
+    )
+    data = await seed(
+        users=users,
+        posts_per_user=posts_per_user,
+        reactions_per_post=reactions_per_post,
+        prefix=PREFIX,
+    )
+    post_cache.clear()
+    results = {}
+    try:
+        for benchmark_name, function in BENCHMARKS.items():
+            if only and benchmark_name not in only:
+                continue
+            generator = random.Random(0)
+            await function(data, generator)
+            timings = []
+            for _ in range(iterations):
+                started_at = time.perf_counter()
+                await function(data, generator)
+                timings.append(time.perf_counter() - started_at)
+            results[benchmark_name] = summarize(timings)
+            stats = results[benchmark_name]
+            print(
+                f"{benchmark_name:>36}: mean {stats['mean_ms']:>9} ms, "
+                f"p50 {stats['p50_ms']:>9} ms, p95 {stats['p95_ms']:>9} ms"
+            )
+    finally:
+        await cleanup(prefix=PREFIX)
+    return {
+        "users": users,
+        "posts_per_user": posts_per_user,
+        "reactions_per_post": reactions_per_post,
+        "benchmarks": results,
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    only = args.only.split(",") if args.only else []
+    try:
+        return {
+            name: await run_dataset(name, args.iterations, only)
+            for name in args.datasets.split(",")
+        }
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--datasets", default="small,medium,large")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--only", default="", help="comma-separated benchmarks")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results are saved to {args.output}")
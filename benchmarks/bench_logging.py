@@ -0,0 +1,109 @@
+"""
+Measures the per-call overhead of @logger.catch on the feed hot path and the
+cost of logging an error storm to a file synchronously, through the
+background queue and through the queue with rate limiting of repeated errors.
+
+Usage:
+    python -m benchmarks.bench_logging [--calls 100000] [--errors 20000]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from src.feed.cache import post_cache
+from src.feed.utils import create_dict_from_post_data, get_post_by_post_id_json
+from src.utils import LogFilter, logger
+
+POST = {
+    "id": 1,
+    "title": "Пост",
+    "text": "Текст",
+    "views": 0,
+    "user_id": 1,
+    "version": 1,
+}
+
+
+def bench_sync(function, calls: int, *args) -> float:
+    started_at = time.perf_counter()
+    for _ in range(calls):
+        function(*args)
+    return time.perf_counter() - started_at
+
+
+async def bench_async(function, calls: int, **kwargs) -> float:
+    started_at = time.perf_counter()
+    for _ in range(calls):
+        await function(**kwargs)
+    return time.perf_counter() - started_at
+
+
+def bench_errors(errors: int, path: Path, **sink_options) -> float:
+    logger.remove()
+    logger.add(
+        path,
+        format="{time}\t|\t{level}\t|\t{message}",
+        rotation="10MB",
+        compression="zip",
+        **sink_options,
+    )
+    started_at = time.perf_counter()
+    for _ in range(errors):
+        logger.error("No row was found when one was required")
+    elapsed = time.perf_counter() - started_at
+    logger.remove()
+    return elapsed
+
+
+def report(name: str, seconds: float, calls: int) -> None:
+    print(f"{name:>40}: {seconds / calls * 1e6:8.3f} us per call")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--errors", type=int, default=20000)
+    args = parser.parse_args()
+
+    post_cache.set(POST["id"], POST)
+    post = asyncio.run(get_post_by_post_id_json(post_id=POST["id"], session=None))
+    assert post["data"] == [POST]
+
+    print("@logger.catch overhead:")
+    row = type("Row", (), POST)
+    for name, function in (
+        ("create_dict_from_post_data", create_dict_from_post_data),
+        ("create_dict_from_post_data (bare)", create_dict_from_post_data.__wrapped__),
+    ):
+        report(name, bench_sync(function, args.calls, row), args.calls)
+    for name, function in (
+        ("get_post_by_post_id_json, cached", get_post_by_post_id_json),
+        (
+            "get_post_by_post_id_json, cached (bare)",
+            get_post_by_post_id_json.__wrapped__,
+        ),
+    ):
+        seconds = asyncio.run(
+            bench_async(function, args.calls, post_id=POST["id"], session=None)
+        )
+        report(name, seconds, args.calls)
+
+    print("Error storm:")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, sink_options in (
+            ("synchronous file sink", {}),
+            ("queued file sink", {"enqueue": True}),
+            ("queued file sink, JSON", {"enqueue": True, "serialize": True}),
+            (
+                "queued file sink, rate limited",
+                {"enqueue": True, "filter": LogFilter(error_rate_limit=10)},
+            ),
+        ):
+            path = Path(directory) / f"{len(name)}.log"
+            report(name, bench_errors(args.errors, path, **sink_options), args.errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Benchmarks the full-text search of posts on a generated corpus.
+
+Inserts the posts of random Russian words on the server side, then measures
+search_posts_json for a frequent term, a rare term and a phrase, with the
+author filter and on the next page, against a LIKE '%term%' scan of the same
+corpus. The corpus is removed afterwards.
+
+Usage:
+    python -m benchmarks.bench_search [--posts 1000000] [--users 100]
+        [--iterations 20] [--output bench_search.json]
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict
+
+from sqlalchemy import func, or_, select, text
+
+from benchmarks.bench_feed_utils import summarize
+from benchmarks.seed import cleanup, seed
+from src.database import async_session_maker, dispose_engine, engine
+from src.feed.models import SEARCH_CONFIG, post
+from src.feed.utils import search_posts_json
+
+PREFIX = "benchsearch"
+CHUNK_SIZE = 100000
+# the first words are the most frequent ones
+WORDS = [
+    "новости",
+    "город",
+    "работа",
+    "друзья",
+    "музыка",
+    "погода",
+    "книга",
+    "фильм",
+    "путешествие",
+    "спорт",
+    "кофе",
+    "программирование",
+    "история",
+    "природа",
+    "семья",
+    "выходные",
+    "концерт",
+    "выставка",
+    "рецепт",
+    "велосипед",
+    "море",
+    "горы",
+    "театр",
+    "фотография",
+    "библиотека",
+    "архитектура",
+    "астрономия",
+    "каллиграфия",
+    "орнитология",
+]
+# added to the text of every RARE_EVERY-th post only
+RARE_WORD = "вулканология"
+RARE_EVERY = 1000
+
+# words are picked as WORDS[n * random() ^ 3], so their frequencies fall fast
+INSERT_POSTS = text(
+    """
+    INSERT INTO post (title, text, views, user_id)
+    SELECT
+        (SELECT string_agg(word, ' ') FROM (
+            SELECT words[1 + floor(power(random(), 3) * cardinality(words))::int]
+            FROM generate_series(1, 2 + number % 3)
+        ) AS title_words (word)),
+        (SELECT string_agg(word, ' ') FROM (
+            SELECT words[1 + floor(power(random(), 3) * cardinality(words))::int]
+            FROM generate_series(1, 10 + number % 30)
+        ) AS text_words (word))
+            || CASE WHEN number % :rare_every = 0 THEN ' ' || :rare_word ELSE '' END,
+        0,
+        user_ids[1 + number % cardinality(user_ids)]
+    FROM generate_series(:start, :stop - 1) AS number,
+        CAST(:words AS text[]) AS words,
+        CAST(:user_ids AS integer[]) AS user_ids
+    """
+)
+
+Case = Callable[[], Awaitable[None]]
+
+
+async def create_corpus(posts: int, users: int) -> dict:
+    data = await seed(
+        users=users, posts_per_user=0, reactions_per_post=0, prefix=PREFIX
+    )
+    started_at = time.perf_counter()
+    for start in range(0, posts, CHUNK_SIZE):
+        async with engine.begin() as connection:
+            await connection.execute(
+                INSERT_POSTS,
+                {
+                    "start": start,
+                    "stop": min(start + CHUNK_SIZE, posts),
+                    "words": WORDS,
+                    "user_ids": data["user_ids"],
+                    "rare_word": RARE_WORD,
+                    "rare_every": RARE_EVERY,
+                },
+            )
+        print(f"Inserted {min(start + CHUNK_SIZE, posts)} of {posts} posts")
+    # VACUUM also moves the pending entries of the GIN index to its tree
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text("VACUUM ANALYZE post"))
+    print(f"Corpus is created in {time.perf_counter() - started_at:.1f} s")
+    return data
+
+
+def search_case(**kwargs) -> Case:
+    async def run() -> None:
+        async with async_session_maker() as session:
+            response = await search_posts_json(session=session, **kwargs)
+        assert response["status"] == "success", response
+
+    return run
+
+
+def next_page_case(query: str) -> Case:
+    async def run() -> None:
+        async with async_session_maker() as session:
+            first_page = await search_posts_json(query=query, session=session)
+            await search_posts_json(
+                query=query, session=session, cursor=first_page["next_cursor"]
+            )
+
+    return run
+
+
+def like_case(term: str) -> Case:
+    async def run() -> None:
+        pattern = f"%{term}%"
+        async with async_session_maker() as session:
+            await session.execute(
+                select(post.c.id, post.c.title, post.c.text)
+                .where(or_(post.c.title.ilike(pattern), post.c.text.ilike(pattern)))
+                .order_by(post.c.id.desc())
+                .limit(20)
+            )
+
+    return run
+
+
+async def main(args: argparse.Namespace) -> dict:
+    data = await create_corpus(posts=args.posts, users=args.users)
+    frequent, rare = WORDS[0], RARE_WORD
+    cases: Dict[str, Case] = {
+        "search_frequent_term": search_case(query=frequent),
+        "search_rare_term": search_case(query=rare),
+        "search_phrase": search_case(query=f'"{WORDS[1]} {WORDS[2]}"'),
+        "search_frequent_term_by_author": search_case(
+            query=frequent, user_id=data["user_ids"][0]
+        ),
+        "search_frequent_term_next_page": next_page_case(query=frequent),
+        "like_frequent_term": like_case(term=frequent),
+        "like_rare_term": like_case(term=rare),
+    }
+    results = {}
+    try:
+        async with async_session_maker() as session:
+            for term in (frequent, rare):
+                matches = await session.scalar(
+                    select(func.count()).where(
+                        post.c.search_vector.bool_op("@@")(
+                            func.websearch_to_tsquery(SEARCH_CONFIG, term)
+                        )
+                    )
+                )
+                print(f"Posts matching «{term}»: {matches}")
+        for name, run in cases.items():
+            await run()
+            timings = []
+            for _ in range(args.iterations):
+                started_at = time.perf_counter()
+                await run()
+                timings.append(time.perf_counter() - started_at)
+            results[name] = summarize(timings)
+            stats = results[name]
+            print(
+                f"{name:>32}: mean {stats['mean_ms']:>10} ms, "
+                f"p50 {stats['p50_ms']:>10} ms, p95 {stats['p95_ms']:>10} ms"
+            )
+    finally:
+        await cleanup(prefix=PREFIX)
+        await dispose_engine()
+    return {"posts": args.posts, "users": args.users, "benchmarks": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--posts", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results are saved to {args.output}")
@@ -0,0 +1,128 @@
+"""
+Compares a page of posts served through a FastAPI route with the default
+response handling (Pydantic models, jsonable_encoder and JSONResponse) with
+the same page served through ORJSONRoute of the Feed router, which writes the
+rows straight to bytes with ORJSONResponse.
+
+Requests are sent to the ASGI app in process, so the timings cover routing,
+dependency resolution and serialization but not the network.
+
+Usage:
+    python -m benchmarks.bench_serialization [--posts 1000] [--repeat 200]
+"""
+import argparse
+import asyncio
+import time
+
+import orjson
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from src.feed.responses import ORJSONRoute
+from src.feed.schemas import PostRead
+from src.utils import STATUS, return_json
+
+COLUMNS = ["id", "title", "text", "views", "user_id"]
+
+
+def make_rows(posts: int) -> list:
+    return IteratorResult(
+        SimpleResultMetaData(COLUMNS),
+        iter(
+            (post_id, f"Пост #{post_id}", "Текст поста " * 20, post_id * 7, 1)
+            for post_id in range(posts, 0, -1)
+        ),
+    ).all()
+
+
+def make_app(rows: list) -> FastAPI:
+    models = APIRouter(default_response_class=JSONResponse, route_class=APIRoute)
+    plain = APIRouter(default_response_class=ORJSONResponse, route_class=ORJSONRoute)
+
+    @models.get("/posts")
+    async def get_posts_with_models() -> dict:
+        data = [
+            PostRead(
+                id=row.id,
+                title=row.title,
+                text=row.text,
+                views=row.views,
+                user_id=row.user_id,
+            ).dict()
+            for row in rows
+        ]
+        return return_json(status=STATUS[200], data=data)
+
+    @plain.get("/posts")
+    async def get_posts_with_orjson() -> dict:
+        return return_json(status=STATUS[200], data=[row._asdict() for row in rows])
+
+    app = FastAPI()
+    app.include_router(models, prefix="/models")
+    app.include_router(plain, prefix="/orjson")
+    return app
+
+
+async def get(app: FastAPI, path: str) -> bytes:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+    }
+    body = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def measure(app: FastAPI, path: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await get(app, path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def run(posts: int, repeat: int) -> None:
+    app = make_app(make_rows(posts))
+    assert orjson.loads(await get(app, "/models/posts")) == orjson.loads(
+        await get(app, "/orjson/posts")
+    )
+    for name, path in (
+        ("pydantic + json", "/models/posts"),
+        ("orjson", "/orjson/posts"),
+    ):
+        seconds = await measure(app, path, repeat)
+        print(f"{name:>16}: {seconds / repeat * 1000:.3f} ms per response")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(posts=args.posts, repeat=args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+HTTP load test of the feed endpoints.
+
+Seeds the database with users, posts and reactions, logs the users in and
+drives a mix of requests against the ASGI app from src/main.py with a number
+of concurrent clients for the given time. Reports RPS and p50/p95/p99
+latencies per endpoint and saves them as JSON to compare runs between
+commits. The seeded data is removed afterwards.
+
+Usage:
+    python -m benchmarks.load_test [--scenario mixed] [--duration 30]
+        [--concurrency 20] [--users 100] [--posts-per-user 50]
+        [--reactions-per-post 10] [--output load_test.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from httpx import AsyncClient
+
+from benchmarks.seed import cleanup, seed
+from src.main import app
+
+SCENARIOS = {
+    "read": {"get_post": 40, "get_posts": 30, "get_reactions": 30},
+    "write": {"view_post": 30, "like_post": 35, "create_post": 35},
+    "mixed": {
+        "get_post": 30,
+        "get_posts": 20,
+        "get_reactions": 15,
+        "view_post": 15,
+        "like_post": 10,
+        "create_post": 10,
+    },
+}
+PREFIX = "loadtest"
+
+
+def percentile(latencies: List[float], share: float) -> float:
+    """Nearest-rank percentile of sorted latencies."""
+    index = max(0, min(len(latencies) - 1, round(share * len(latencies)) - 1))
+    return latencies[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class LoadTest:
+    def __init__(self, client: AsyncClient, data: dict, scenario: Dict[str, int]):
+        self.client = client
+        self.data = data
+        self.endpoints = list(scenario)
+        self.weights = list(scenario.values())
+        self.latencies: Dict[str, List[float]] = {name: [] for name in scenario}
+        self.errors: Dict[str, int] = {name: 0 for name in scenario}
+        self.cookies: Dict[int, dict] = {}
+
+    async def log_in(self, clients: int) -> None:
+        for user_id, email in list(zip(self.data["user_ids"], self.data["emails"]))[
+            :clients
+        ]:
+            response = await self.client.post(
+                "/auth/jwt/login",
+                data={"username": email, "password": self.data["password"]},
+            )
+            response.raise_for_status()
+            self.cookies[user_id] = {
+                "fastapiusersauth": response.cookies["fastapiusersauth"]
+            }
+
+    def request(self, generator: random.Random, endpoint: str, user_id: int):
+        post_id = generator.choice(self.data["post_ids"])
+        while self.data["authors"][post_id] == user_id:
+            post_id = generator.choice(self.data["post_ids"])
+        cookies = self.cookies[user_id]
+        if endpoint == "get_post":
+            return self.client.get(f"/feed/get_post/{post_id}")
+        if endpoint == "get_posts":
+            author_id = generator.choice(self.data["user_ids"])
+            return self.client.get(f"/feed/get_posts/{author_id}")
+        if endpoint == "get_reactions":
+            return self.client.get(f"/feed/get_reactions/{post_id}")
+        if endpoint == "view_post":
+            return self.client.put(f"/feed/view_post/{post_id}", cookies=cookies)
+        if endpoint == "like_post":
+            action = generator.choice(("like_post", "dislike_post"))
+            return self.client.put(f"/feed/{action}/{post_id}", cookies=cookies)
+        if endpoint == "create_post":
+            return self.client.post(
+                "/feed/create_post",
+                json={"title": "Нагрузочный пост", "text": "Текст"},
+                cookies=cookies,
+            )
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    async def run_client(self, number: int, deadline: float) -> None:
+        generator = random.Random(number)
+        user_ids = list(self.cookies)
+        user_id = user_ids[number % len(user_ids)]
+        while time.perf_counter() < deadline:
+            endpoint = generator.choices(self.endpoints, self.weights)[0]
+            started_at = time.perf_counter()
+            response = await self.request(generator, endpoint, user_id)
+            self.latencies[endpoint].append(time.perf_counter() - started_at)
+            if response.status_code != 200 or response.json()["status"] != "success":
+                self.errors[endpoint] += 1
+
+    async def run(self, concurrency: int, duration: float) -> dict:
+        started_at = time.perf_counter()
+        deadline = started_at + duration
+        await asyncio.gather(
+            *(self.run_client(number, deadline) for number in range(concurrency))
+        )
+        elapsed = time.perf_counter() - started_at
+        endpoints = {
+            endpoint: summarize(
+                self.latencies[endpoint], self.errors[endpoint], elapsed
+            )
+            for endpoint in self.endpoints
+        }
+        total = summarize(
+            [latency for values in self.latencies.values() for latency in values],
+            sum(self.errors.values()),
+            elapsed,
+        )
+        return {"endpoints": endpoints, "total": total}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    data = await seed(
+        users=args.users,
+        posts_per_user=args.posts_per_user,
+        reactions_per_post=args.reactions_per_post,
+        prefix=PREFIX,
+    )
+    await app.router.startup()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            load_test = LoadTest(client, data, SCENARIOS[args.scenario])
+            await load_test.log_in(min(args.concurrency, args.users))
+            results = await load_test.run(args.concurrency, args.duration)
+    finally:
+        await app.router.shutdown()
+        await cleanup(prefix=PREFIX)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="mixed")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts-per-user", type=int, default=50)
+    parser.add_argument("--reactions-per-post", type=int, default=10)
+    parser.add_argument("--output", default="load_test.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    print(
+        f"{'endpoint':>14} {'requests':>9} {'errors':>7} {'rps':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for endpoint, stats in {**results["endpoints"], "total": results["total"]}.items():
+        print(
+            f"{endpoint:>14} {stats['requests']:>9} {stats['errors']:>7} "
+            f"{stats['rps']:>8} {stats.get('p50_ms', '-'):>8} "
+            f"{stats.get('p95_ms', '-'):>8} {stats.get('p99_ms', '-'):>8}"
+        )
+    with open(args.output, "w") as file:
+        json.dump(
+            {
+                "commit": git_commit(),
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "parameters": vars(args),
+                **results,
+            },
+            file,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"Results are saved to {args.output}")
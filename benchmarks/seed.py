@@ -0,0 +1,141 @@
+"""
+Seeds the database configured in src/config.py with users, posts and
+reactions for benchmarks and removes them afterwards.
+
+All seeded users have e-mails starting with the given prefix, so a data set
+can be removed without touching the other rows.
+"""
+import random
+from typing import List
+
+from sqlalchemy import delete, insert, select, text, update
+
+from src.auth.models import User
+from src.auth.password import password_helper
+from src.config import TREND_DISLIKE_WEIGHT, TREND_LIKE_WEIGHT, TREND_VIEW_WEIGHT
+from src.database import async_session_maker, engine
+from src.feed.models import post, user_post
+from src.feed.trending import trend_values
+from src.feed.utils import reconcile_reaction_counters
+
+PASSWORD = "benchmark-password"
+CHUNK_SIZE = 1000
+
+
+def chunks(rows: list, size: int = CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+async def seed(
+    users: int,
+    posts_per_user: int,
+    reactions_per_post: int,
+    prefix: str = "benchmark",
+    random_seed: int = 0,
+) -> dict:
+    """
+    Creates the users, posts_per_user posts of every user and up to
+    reactions_per_post reactions of the other users on every post.
+
+    Returns the ids of the users and the posts, the e-mails of the users,
+    their password and the authors of the posts.
+    """
+    await cleanup(prefix=prefix)
+    generator = random.Random(random_seed)
+    hashed_password = password_helper.hash(PASSWORD)
+    emails = [f"{prefix}{number}@example.com" for number in range(users)]
+
+    async with async_session_maker() as session:
+        result = await session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [
+                {
+                    "email": email,
+                    "name": email.split("@")[0],
+                    "hashed_password": hashed_password,
+                    "is_active": True,
+                    "is_superuser": False,
+                    "is_verified": False,
+                }
+                for email in emails
+            ],
+        )
+        user_ids = list(result.scalars())
+
+        post_rows = [
+            {
+                "title": f"Пост #{number} пользователя #{user_id}",
+                "text": "Текст тестового поста. " * generator.randint(1, 20),
+                "views": 0,
+                "user_id": user_id,
+            }
+            for user_id in user_ids
+            for number in range(posts_per_user)
+        ]
+        post_ids = []
+        for rows in chunks(post_rows):
+            result = await session.execute(
+                insert(post).returning(post.c.id, sort_by_parameter_order=True), rows
+            )
+            post_ids.extend(result.scalars())
+        authors = {post_id: row["user_id"] for post_id, row in zip(post_ids, post_rows)}
+
+        reaction_rows = []
+        for post_id, author_id in authors.items():
+            readers = [user_id for user_id in user_ids if user_id != author_id]
+            for user_id in generator.sample(
+                readers, min(reactions_per_post, len(readers))
+            ):
+                reaction_rows.append(
+                    {
+                        "user_id": user_id,
+                        "post_id": post_id,
+                        "like": generator.random() < 0.7,
+                    }
+                )
+        for rows in chunks(reaction_rows):
+            await session.execute(insert(user_post), rows)
+        await session.commit()
+
+    async with async_session_maker() as session:
+        await reconcile_reaction_counters(session=session, post_ids=post_ids)
+        await session.execute(
+            update(post)
+            .where(post.c.user_id.in_(user_ids))
+            .values(
+                **trend_values(
+                    post.c.views * TREND_VIEW_WEIGHT
+                    + post.c.likes_count * TREND_LIKE_WEIGHT
+                    + post.c.dislikes_count * TREND_DISLIKE_WEIGHT
+                )
+            )
+        )
+        await session.commit()
+    async with engine.connect() as connection:
+        await connection.execute(text("ANALYZE"))
+        await connection.commit()
+
+    return {
+        "user_ids": user_ids,
+        "emails": emails,
+        "password": PASSWORD,
+        "post_ids": post_ids,
+        "authors": authors,
+    }
+
+
+async def cleanup(prefix: str = "benchmark") -> None:
+    """Removes the seeded users with their posts and reactions."""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(User.id).where(User.email.like(f"{prefix}%@example.com"))
+        )
+        user_ids: List[int] = list(result.scalars())
+        if not user_ids:
+            return
+        # reactions and timeline entries are deleted with the posts by the foreign
+        # keys, the seeded users react to the seeded posts only
+        await session.execute(delete(post).where(post.c.user_id.in_(user_ids)))
+        await session.execute(delete(User).where(User.id.in_(user_ids)))
+        await session.commit()
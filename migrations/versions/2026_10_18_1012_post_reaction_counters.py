@@ -0,0 +1,46 @@
+"""Post reaction counters
+
+Revision ID: af7118240379
+Revises: 883df0ed908b
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "af7118240379"
+down_revision = "883df0ed908b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "post",
+        sa.Column("likes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "post",
+        sa.Column("dislikes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE post
+        SET likes_count = counts.likes, dislikes_count = counts.dislikes
+        FROM (
+            SELECT
+                post_id,
+                count(*) FILTER (WHERE "like") AS likes,
+                count(*) FILTER (WHERE NOT "like") AS dislikes
+            FROM user_post
+            GROUP BY post_id
+        ) AS counts
+        WHERE post.id = counts.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("post", "dislikes_count")
+    op.drop_column("post", "likes_count")
@@ -0,0 +1,57 @@
+"""Feed and Auth indexes
+
+Revision ID: 5c0e7d2b91a4
+Revises: af7118240379
+Create Date: 2026-10-18 11:47:05.731982
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c0e7d2b91a4"
+down_revision = "af7118240379"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # build the indexes without locking the tables against writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_post_user_id_id",
+            "post",
+            ["user_id", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_user_post_post_id",
+            "user_post",
+            ["post_id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_user_email_lower",
+            "user",
+            [sa.text("lower(email)")],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_user_email_lower",
+            table_name="user",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_user_post_post_id",
+            table_name="user_post",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_post_user_id_id",
+            table_name="post",
+            postgresql_concurrently=True,
+        )
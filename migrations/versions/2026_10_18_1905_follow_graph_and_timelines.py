@@ -0,0 +1,54 @@
+"""Follow graph and home timelines
+
+Revision ID: 3e9a41c7d2f8
+Revises: 5c0e7d2b91a4
+Create Date: 2026-10-18 19:05:12.384106
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3e9a41c7d2f8"
+down_revision = "5c0e7d2b91a4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user",
+        sa.Column("followers_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.create_table(
+        "follow",
+        sa.Column("follower_id", sa.Integer(), nullable=False),
+        sa.Column("followee_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["follower_id"], ["user.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["followee_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("follower_id", "followee_id"),
+    )
+    op.create_index("ix_follow_followee_id", "follow", ["followee_id"])
+    op.create_table(
+        "timeline",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["post_id"], ["post.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["author_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "post_id"),
+    )
+    op.create_index("ix_timeline_post_id", "timeline", ["post_id"])
+    op.create_index(
+        "ix_timeline_user_id_author_id", "timeline", ["user_id", "author_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_timeline_user_id_author_id", table_name="timeline")
+    op.drop_index("ix_timeline_post_id", table_name="timeline")
+    op.drop_table("timeline")
+    op.drop_index("ix_follow_followee_id", table_name="follow")
+    op.drop_table("follow")
+    op.drop_column("user", "followers_count")
@@ -0,0 +1,34 @@
+"""Post trend scores
+
+Revision ID: 9b2f6e1c4a73
+Revises: 3e9a41c7d2f8
+Create Date: 2026-10-18 21:40:37.512904
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b2f6e1c4a73"
+down_revision = "3e9a41c7d2f8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "post",
+        sa.Column("trend_score", sa.Float(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "post", sa.Column("trend_updated_at", sa.DateTime(timezone=True), nullable=True)
+    )
+    op.add_column("post", sa.Column("trend_rank", sa.Float(), nullable=True))
+    op.create_index("ix_post_trend_rank", "post", ["trend_rank"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_post_trend_rank", table_name="post")
+    op.drop_column("post", "trend_rank")
+    op.drop_column("post", "trend_updated_at")
+    op.drop_column("post", "trend_score")
@@ -0,0 +1,43 @@
+"""Post search vector
+
+Revision ID: d47a0c95e81b
+Revises: 9b2f6e1c4a73
+Create Date: 2026-10-18 23:15:08.641227
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "d47a0c95e81b"
+down_revision = "9b2f6e1c4a73"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "post",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('russian', coalesce(text, '')), 'B')",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_post_search_vector",
+        "post",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_post_search_vector", table_name="post")
+    op.drop_column("post", "search_vector")
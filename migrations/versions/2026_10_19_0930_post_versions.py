@@ -0,0 +1,26 @@
+"""Post versions
+
+Revision ID: 6a1d3f08c2e5
+Revises: d47a0c95e81b
+Create Date: 2026-10-19 09:30:44.207183
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "6a1d3f08c2e5"
+down_revision = "d47a0c95e81b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "post",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("post", "version")
@@ -0,0 +1,35 @@
+"""Cascade deletes of posts to their reactions
+
+Revision ID: 2f8c7b4e0d19
+Revises: 6a1d3f08c2e5
+Create Date: 2026-10-19 11:20:16.930572
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2f8c7b4e0d19"
+down_revision = "6a1d3f08c2e5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # reactions of users are not cascaded, deleting them has to update the
+    # counters of the posts
+    op.drop_constraint("user_post_post_id_fkey", "user_post", type_="foreignkey")
+    op.create_foreign_key(
+        "user_post_post_id_fkey",
+        "user_post",
+        "post",
+        ["post_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("user_post_post_id_fkey", "user_post", type_="foreignkey")
+    op.create_foreign_key(
+        "user_post_post_id_fkey", "user_post", "post", ["post_id"], ["id"]
+    )
@@ -0,0 +1,23 @@
+"""Remember the last post of an author that was not pushed to timelines
+
+Revision ID: 9c4e2a7f1b36
+Revises: 2f8c7b4e0d19
+Create Date: 2026-10-19 14:30:42.118305
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c4e2a7f1b36"
+down_revision = "2f8c7b4e0d19"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("user", sa.Column("unpushed_post_id", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("user", "unpushed_post_id")
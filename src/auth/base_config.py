@@ -1,30 +1,77 @@
-from fastapi_users import FastAPIUsers
-from fastapi_users.authentication import (
-    AuthenticationBackend,
-    CookieTransport,
-    JWTStrategy,
-)
-
-from src.auth.manager import get_user_manager
-from src.auth.models import User
-from src.config import JWT_SECRET
-
-cookie_transport = CookieTransport(cookie_max_age=3600)
-
-
-def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=JWT_SECRET, lifetime_seconds=3600)
-
-
-auth_backend = AuthenticationBackend(
-    name="jwt",
-    transport=cookie_transport,
-    get_strategy=get_jwt_strategy,
-)
-
-fastapi_users = FastAPIUsers[User, int](
-    get_user_manager,
-    [auth_backend],
-)
-
-current_user = fastapi_users.current_user()
+from typing import Any, Dict, Optional
+
+import jwt
+from fastapi_users import BaseUserManager, FastAPIUsers, exceptions
+from fastapi_users.authentication import (
+    AuthenticationBackend,
+    CookieTransport,
+    JWTStrategy,
+)
+from fastapi_users.jwt import decode_jwt
+
+from src.auth.cache import user_cache
+from src.auth.manager import get_user_manager
+from src.auth.models import User
+from src.config import JWT_SECRET
+
+cookie_transport = CookieTransport(cookie_max_age=3600)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """
+    JWTStrategy that takes the users of valid tokens from user_cache
+    instead of loading them from the database on every request.
+
+    The cache keeps the column values of the users, every request gets its
+    own User built from them.
+    """
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager[User, int]
+    ) -> Optional[User]:
+        user_id = self.read_user_id(token, user_manager)
+        if user_id is None:
+            return None
+
+        fields = user_cache.get(user_id)
+        if fields is not None:
+            return User(**fields)
+        user = await super().read_token(token, user_manager)
+        if user is not None:
+            user_cache.set(user.id, user_fields(user))
+        return user
+
+    def read_user_id(
+        self, token: Optional[str], user_manager: BaseUserManager[User, int]
+    ) -> Optional[int]:
+        if token is None:
+            return None
+        try:
+            data = decode_jwt(
+                token, self.decode_key, self.token_audience, algorithms=[self.algorithm]
+            )
+            return user_manager.parse_id(data["sub"])
+        except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+            return None
+
+
+def user_fields(user: User) -> Dict[str, Any]:
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
+def get_jwt_strategy() -> JWTStrategy:
+    return CachedJWTStrategy(secret=JWT_SECRET, lifetime_seconds=3600)
+
+
+auth_backend = AuthenticationBackend(
+    name="jwt",
+    transport=cookie_transport,
+    get_strategy=get_jwt_strategy,
+)
+
+fastapi_users = FastAPIUsers[User, int](
+    get_user_manager,
+    [auth_backend],
+)
+
+current_user = fastapi_users.current_user()
@@ -0,0 +1,5 @@
+from src.cache import TTLCache
+from src.config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+# authenticated users by id, invalidated by UserManager on update and delete
+user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
@@ -1,20 +1,76 @@
-from typing import Optional
-
-from fastapi import Depends, Request
-from fastapi_users import BaseUserManager, IntegerIDMixin
-
-from src.auth.models import User
-from src.auth.utils import get_user_db
-from src.config import USER_MANAGER_SECRET
-
-
-class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
-    reset_password_token_secret = USER_MANAGER_SECRET
-    verification_token_secret = USER_MANAGER_SECRET
-
-    async def on_after_register(self, user: User, request: Optional[Request] = None):
-        print(f"User {user.id} has registered.")
-
-
-async def get_user_manager(user_db=Depends(get_user_db)):
-    yield UserManager(user_db)
+from typing import Any, Dict, Optional
+
+from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi_users import BaseUserManager, IntegerIDMixin, exceptions
+from fastapi_users.db import BaseUserDatabase
+
+from src.auth.cache import user_cache
+from src.auth.models import User
+from src.auth.password import ThreadPoolPasswordHelper, password_helper
+from src.auth.schemas import UserCreate
+from src.auth.utils import get_user_db
+from src.config import USER_MANAGER_SECRET
+
+
+class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
+    reset_password_token_secret = USER_MANAGER_SECRET
+    verification_token_secret = USER_MANAGER_SECRET
+    password_helper: ThreadPoolPasswordHelper
+
+    def __init__(
+        self,
+        user_db: BaseUserDatabase[User, int],
+        password_helper: ThreadPoolPasswordHelper = password_helper,
+    ):
+        super().__init__(user_db, password_helper=password_helper)
+
+    # BaseUserManager hashes and verifies passwords synchronously, so the
+    # password helper computes the results in its pool before it is called
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        async with self.password_helper.precomputed(hashes=[user_create.password]):
+            return await super().create(user_create, safe, request)
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # BaseUserManager hashes the password anyway against timing attacks
+            calls = {"hashes": [credentials.password]}
+        else:
+            calls = {"verifications": [(credentials.password, user.hashed_password)]}
+        async with self.password_helper.precomputed(**calls):
+            return await super().authenticate(credentials)
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        password = update_dict.get("password")
+        async with self.password_helper.precomputed(
+            hashes=[password] if password is not None else []
+        ):
+            return await super()._update(user, update_dict)
+
+    async def on_after_register(self, user: User, request: Optional[Request] = None):
+        print(f"User {user.id} has registered.")
+
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: Dict[str, Any],
+        request: Optional[Request] = None,
+    ):
+        user_cache.invalidate(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate(user.id)
+
+
+async def get_user_manager(user_db=Depends(get_user_db)):
+    yield UserManager(user_db)
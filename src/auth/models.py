@@ -1,15 +1,21 @@
-from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTable
-from sqlalchemy import Boolean, Column, Integer, String, Table
-
-from src.database import Base, metadata
-
-
-class User(SQLAlchemyBaseUserTable[int], Base):
-    metadata = metadata
-    id = Column(Integer, primary_key=True)
-    email = Column(String, nullable=False)
-    name = Column(String, nullable=False)
-    hashed_password: str = Column(String(length=1024), nullable=False)
-    is_active: bool = Column(Boolean, default=True, nullable=False)
-    is_superuser: bool = Column(Boolean, default=False, nullable=False)
-    is_verified: bool = Column(Boolean, default=False, nullable=False)
+from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTable
+from sqlalchemy import Boolean, Column, Index, Integer, String, Table, func
+
+from src.database import Base, metadata
+
+
+class User(SQLAlchemyBaseUserTable[int], Base):
+    metadata = metadata
+    id = Column(Integer, primary_key=True)
+    email = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    hashed_password: str = Column(String(length=1024), nullable=False)
+    is_active: bool = Column(Boolean, default=True, nullable=False)
+    is_superuser: bool = Column(Boolean, default=False, nullable=False)
+    is_verified: bool = Column(Boolean, default=False, nullable=False)
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # newest post published while the user had too many followers to push it
+    unpushed_post_id = Column(Integer, nullable=True)
+
+    # fastapi-users looks users up by lower(email)
+    __table_args__ = (Index("ix_user_email_lower", func.lower(email)),)
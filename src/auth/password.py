@@ -0,0 +1,94 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi_users.password import PasswordHelper
+from passlib.context import CryptContext
+
+from src.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+# results of the calls the current task is going to make, computed in the pool
+_precomputed: ContextVar[Optional[Dict[tuple, Any]]] = ContextVar(
+    "precomputed_password_calls", default=None
+)
+
+
+class ThreadPoolPasswordHelper(PasswordHelper):
+    """
+    PasswordHelper with coroutines that hash and verify passwords in a
+    bounded thread pool, so bcrypt does not block the event loop.
+
+    fastapi-users calls hash and verify_and_update synchronously, so the
+    user manager computes their results in the pool beforehand with
+    precomputed() and the synchronous calls return them.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS) -> None:
+        super().__init__(
+            CryptContext(
+                schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+            )
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password"
+        )
+
+    def hash(self, password: str) -> str:
+        return self._call(("hash", password), super().hash, password)
+
+    def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, str]:
+        return self._call(
+            ("verify_and_update", plain_password, hashed_password),
+            super().verify_and_update,
+            plain_password,
+            hashed_password,
+        )
+
+    def _call(self, key: tuple, function: Callable, *args) -> Any:
+        precomputed = _precomputed.get()
+        if precomputed is not None and key in precomputed:
+            return precomputed.pop(key)
+        return function(*args)
+
+    async def hash_async(self, password: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, super().hash, password)
+
+    async def verify_and_update_async(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, super().verify_and_update, plain_password, hashed_password
+        )
+
+    @asynccontextmanager
+    async def precomputed(
+        self,
+        hashes: Iterable[str] = (),
+        verifications: Iterable[Tuple[str, str]] = (),
+    ) -> AsyncIterator[None]:
+        """
+        Computes the hashes of the passwords and the verifications of the
+        (plain, hashed) pairs in the pool, so the synchronous calls with the
+        same arguments within the block return them at once.
+        """
+        results = {}
+        for password in hashes:
+            results[("hash", password)] = await self.hash_async(password)
+        for plain_password, hashed_password in verifications:
+            results[
+                ("verify_and_update", plain_password, hashed_password)
+            ] = await self.verify_and_update_async(plain_password, hashed_password)
+        token = _precomputed.set(results)
+        try:
+            yield
+        finally:
+            _precomputed.reset(token)
+
+
+password_helper = ThreadPoolPasswordHelper()
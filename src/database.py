@@ -1,25 +1,225 @@
-from typing import AsyncGenerator
-
-from sqlalchemy import MetaData
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy.pool import NullPool
-
-from src.config import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
-
-DATABASE_URL = (
-    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
-Base = declarative_base()
-
-metadata = MetaData()
-
-engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
-metadata.bind = engine
-
-
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
-        yield session
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, List, Mapping
+
+from fastapi import Request
+from sqlalchemy import MetaData
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from src.config import (
+    DB_HOST,
+    DB_MAX_OVERFLOW,
+    DB_NAME,
+    DB_PASSWORD,
+    DB_POOL_CLASS,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_WARMUP,
+    DB_PORT,
+    DB_REPLICA_SELECTION,
+    DB_REPLICA_URLS,
+    DB_USER,
+    READ_AFTER_WRITE_WINDOW,
+)
+
+DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+Base = declarative_base()
+
+metadata = MetaData()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool which also tracks how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+
+def build_engine(url: str, pool_class: str = DB_POOL_CLASS) -> AsyncEngine:
+    if pool_class == "null":
+        return create_async_engine(
+            url, poolclass=NullPool, pool_pre_ping=DB_POOL_PRE_PING
+        )
+    return create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+
+
+engine = build_engine(DATABASE_URL)
+async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+metadata.bind = engine
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_maker() as session:
+        yield session
+
+
+class ReplicaRouter:
+    """
+    Opens read-only sessions on the replica engines.
+
+    "round_robin" takes the replicas in turn, "least_busy" takes the one with
+    the fewest sessions in progress in this worker, in turn among equal ones.
+    """
+
+    selections = ("round_robin", "least_busy")
+
+    def __init__(
+        self, engines: List[AsyncEngine], selection: str = DB_REPLICA_SELECTION
+    ):
+        if selection not in self.selections:
+            raise ValueError(f"Unknown replica selection: {selection}")
+        self.engines = engines
+        self.selection = selection
+        self.session_makers = [
+            sessionmaker(engine_, class_=AsyncSession, expire_on_commit=False)
+            for engine_ in engines
+        ]
+        self.in_use = [0] * len(engines)
+        self._next = 0
+
+    def choose(self) -> int:
+        count = len(self.engines)
+        if self.selection == "least_busy":
+            index = min(
+                range(count),
+                key=lambda number: (self.in_use[number], (number - self._next) % count),
+            )
+        else:
+            index = self._next
+        self._next = (index + 1) % count
+        return index
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        index = self.choose()
+        self.in_use[index] += 1
+        try:
+            async with self.session_makers[index]() as session:
+                session.info["replica"] = True
+                yield session
+        finally:
+            self.in_use[index] -= 1
+
+
+def is_replica_session(session: AsyncSession) -> bool:
+    """Whether the session was opened by ReplicaRouter and may read stale rows."""
+    return session.info.get("replica", False)
+
+
+replica_router = ReplicaRouter([build_engine(url) for url in DB_REPLICA_URLS])
+
+# unix time until which the reads of the client go to the primary
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+def reads_from_primary(cookies: Mapping[str, str]) -> bool:
+    try:
+        return float(cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only handlers: on a replica, or on the primary if there
+    are no replicas or the client has written within READ_AFTER_WRITE_WINDOW.
+    """
+    if not replica_router.engines or reads_from_primary(request.cookies):
+        async with async_session_maker() as session:
+            yield session
+    else:
+        async with replica_router.session() as session:
+            yield session
+
+
+class ReadAfterWriteMiddleware:
+    """
+    ASGI middleware which sets the READ_PRIMARY_COOKIE on the responses to
+    the requests that may write, so the next reads of the client see them.
+    """
+
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, app, window: float = READ_AFTER_WRITE_WINDOW):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.safe_methods:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={time.time() + self.window:.3f}; "
+                    f"Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode())
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+async def warm_up_pool(
+    connections: int = DB_POOL_WARMUP, engine_: AsyncEngine = engine
+) -> None:
+    pool = engine_.pool
+    if not isinstance(pool, TimedQueuePool):
+        return
+    opened = await asyncio.gather(
+        *(engine_.connect().start() for _ in range(min(connections, pool.size())))
+    )
+    for connection in opened:
+        await connection.close()
+
+
+async def dispose_engine(engine_: AsyncEngine = engine) -> None:
+    await engine_.dispose()
+
+
+def get_pool_stats(engine_: AsyncEngine = engine) -> dict:
+    pool = engine_.pool
+    if not isinstance(pool, TimedQueuePool):
+        return {"pool_class": type(pool).__name__}
+    return {
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "wait_count": pool.wait_count,
+        "wait_time_total": pool.wait_time_total,
+        "wait_time_max": pool.wait_time_max,
+    }
@@ -0,0 +1,5 @@
+from src.cache import TTLCache
+from src.config import POST_CACHE_SIZE, POST_CACHE_TTL
+
+# post rows by id, shared by all feed operations of the worker
+post_cache = TTLCache(max_size=POST_CACHE_SIZE, ttl=POST_CACHE_TTL)
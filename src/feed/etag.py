@@ -0,0 +1,53 @@
+import hashlib
+from typing import List, Optional, Tuple
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+from src.utils import STATUS
+
+
+def versions_etag(versions: List[Tuple[int, int]], next_cursor: Optional[str]) -> str:
+    """
+    Strong ETag of posts: a hash of their ids and versions and of the next
+    cursor, so any change of the posts, a new or a deleted post changes it.
+    """
+    state = [[post_id, version] for post_id, version in versions]
+    digest = hashlib.blake2b(orjson.dumps([state, next_cursor]), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def make_etag(response: dict) -> Optional[str]:
+    """ETag of a successful response with posts."""
+    if response["status"] != STATUS[200]:
+        return None
+    return versions_etag(
+        [(data["id"], data["version"]) for data in response["data"]],
+        response.get("next_cursor"),
+    )
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def conditional_response(response: dict, if_none_match: Optional[str]) -> Response:
+    """Answers 304 without the body if the client has the current version."""
+    etag = make_etag(response)
+    if etag is None:
+        return ORJSONResponse(response)
+    if etag_matches(etag, if_none_match):
+        return not_modified(etag)
+    return ORJSONResponse(response, headers={"ETag": etag})
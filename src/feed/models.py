@@ -1,38 +1,122 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Table
-
-from src.auth.models import User
-from src.database import Base, metadata
-
-post = Table(
-    "post",
-    metadata,
-    Column("id", Integer, primary_key=True),
-    Column("title", String, nullable=False),
-    Column("text", String, nullable=True),
-    Column("views", Integer, default=0),
-    Column("user_id", Integer, ForeignKey(User.id)),
-)
-
-user_post = Table(
-    "user_post",
-    metadata,
-    Column("user_id", Integer, ForeignKey(User.id), primary_key=True),
-    Column("post_id", Integer, ForeignKey(post.c.id), primary_key=True),
-    Column("like", Boolean, nullable=False),
-)
-
-
-class Post(Base):
-    __tablename__ = "post"
-    id = Column(Integer, primary_key=True)
-    title = Column(String, nullable=False)
-    text = Column(String, nullable=True)
-    views = Column(Integer, default=0)
-    user_id = Column(Integer, ForeignKey(User.id))
-
-
-class UserPost(Base):
-    __tablename__ = "user_post"
-    user_id = Column(Integer, ForeignKey(User.id), primary_key=True)
-    post_id = Column(Integer, ForeignKey(post.c.id), primary_key=True)
-    like = Column(Boolean, nullable=False)
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from src.auth.models import User
+from src.database import Base, metadata
+
+# text search configuration of the search vectors of posts
+SEARCH_CONFIG = "russian"
+
+post = Table(
+    "post",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("text", String, nullable=True),
+    Column("views", Integer, default=0),
+    Column("user_id", Integer, ForeignKey(User.id)),
+    Column("likes_count", Integer, nullable=False, default=0, server_default="0"),
+    Column("dislikes_count", Integer, nullable=False, default=0, server_default="0"),
+    # trend_score decayed to trend_updated_at, trend_rank orders the posts by
+    # the score decayed to the same moment (see src/feed/trending.py)
+    Column("trend_score", Float, nullable=False, default=0, server_default="0"),
+    Column("trend_updated_at", DateTime(timezone=True), nullable=True),
+    Column("trend_rank", Float, nullable=True),
+    # bumped by every change of the post, ETags of the post responses are built from it
+    Column("version", Integer, nullable=False, default=1, server_default="1"),
+    # maintained by Postgres on every insert and update of the title or the text
+    Column(
+        "search_vector",
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(text, '')), 'B')",
+            persisted=True,
+        ),
+    ),
+    Index("ix_post_user_id_id", "user_id", "id"),
+    Index("ix_post_trend_rank", "trend_rank"),
+    Index("ix_post_search_vector", "search_vector", postgresql_using="gin"),
+)
+
+user_post = Table(
+    "user_post",
+    metadata,
+    Column("user_id", Integer, ForeignKey(User.id), primary_key=True),
+    Column(
+        "post_id", Integer, ForeignKey(post.c.id, ondelete="CASCADE"), primary_key=True
+    ),
+    Column("like", Boolean, nullable=False),
+    Index("ix_user_post_post_id", "post_id"),
+)
+
+
+follow = Table(
+    "follow",
+    metadata,
+    Column(
+        "follower_id",
+        Integer,
+        ForeignKey(User.id, ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "followee_id",
+        Integer,
+        ForeignKey(User.id, ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Index("ix_follow_followee_id", "followee_id"),
+)
+
+# home timelines of followers, filled with the posts of their authors on write
+timeline = Table(
+    "timeline",
+    metadata,
+    Column(
+        "user_id", Integer, ForeignKey(User.id, ondelete="CASCADE"), primary_key=True
+    ),
+    Column(
+        "post_id", Integer, ForeignKey(post.c.id, ondelete="CASCADE"), primary_key=True
+    ),
+    Column(
+        "author_id", Integer, ForeignKey(User.id, ondelete="CASCADE"), nullable=False
+    ),
+    Index("ix_timeline_post_id", "post_id"),
+    Index("ix_timeline_user_id_author_id", "user_id", "author_id"),
+)
+
+
+class Post(Base):
+    __tablename__ = "post"
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    text = Column(String, nullable=True)
+    views = Column(Integer, default=0)
+    user_id = Column(Integer, ForeignKey(User.id))
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    dislikes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    trend_score = Column(Float, nullable=False, default=0, server_default="0")
+    trend_updated_at = Column(DateTime(timezone=True), nullable=True)
+    trend_rank = Column(Float, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+
+class UserPost(Base):
+    __tablename__ = "user_post"
+    user_id = Column(Integer, ForeignKey(User.id), primary_key=True)
+    post_id = Column(
+        Integer, ForeignKey(post.c.id, ondelete="CASCADE"), primary_key=True
+    )
+    like = Column(Boolean, nullable=False)
@@ -0,0 +1,14 @@
+import asyncio
+
+from src.database import async_session_maker
+from src.feed.utils import reconcile_reaction_counters
+
+
+async def main() -> None:
+    async with async_session_maker() as session:
+        repaired = await reconcile_reaction_counters(session=session)
+    print(f"Reaction counters of {repaired} posts have been repaired.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+from functools import wraps
+from typing import Any, Callable
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+
+
+class ORJSONRoute(APIRoute):
+    """
+    Route without a response model whose endpoint's dict is written by
+    ORJSONResponse as is, so FastAPI neither validates it nor walks it with
+    jsonable_encoder. Responses returned by the endpoint are passed through.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any) -> None:
+        @wraps(endpoint)
+        async def orjson_endpoint(*args: Any, **values: Any) -> Response:
+            response = await endpoint(*args, **values)
+            if isinstance(response, Response):
+                return response
+            return ORJSONResponse(response)
+
+        kwargs["response_model"] = None
+        super().__init__(path, orjson_endpoint, **kwargs)
@@ -1,112 +1,271 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from src.auth.base_config import current_user
-from src.auth.models import User
-from src.database import get_async_session
-from src.feed.schemas import PostCreate, PostUpdate
-from src.feed.utils import (
-    create_post_json,
-    delete_post_json,
-    dislike_post_json,
-    edit_post_json,
-    get_likes_by_post_id_json,
-    get_post_by_post_id_json,
-    get_posts_by_user_id_json,
-    like_post_json,
-    remove_the_reaction_json,
-    view_post_json,
-)
-
-router = APIRouter()
-
-
-@router.get("/get_post/{post_id}")
-async def get_post_by_post_id(
-    post_id: int, session: AsyncSession = Depends(get_async_session)
-) -> dict:
-    return await get_post_by_post_id_json(post_id=post_id, session=session)
-
-
-@router.get("/get_reactions/{post_id}")
-async def get_reactions_by_post_id(
-    post_id: int,
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await get_likes_by_post_id_json(post_id=post_id, session=session)
-
-
-@router.get("/get_posts/{user_id}")
-async def get_posts_by_user_id(
-    user_id: int, session: AsyncSession = Depends(get_async_session)
-) -> dict:
-    return await get_posts_by_user_id_json(user_id=user_id, session=session)
-
-
-@router.post("/create_post")
-async def create_post(
-    post_to_create: PostCreate,
-    user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await create_post_json(
-        post_to_create=post_to_create, user_id=user.id, session=session
-    )
-
-
-@router.delete("/delete_post/{post_id}")
-async def delete_post(
-    post_id: int,
-    user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await delete_post_json(post_id=post_id, user_id=user.id, session=session)
-
-
-@router.put("/edit_post/{post_id}")
-async def edit_post(
-    post_update: PostUpdate,
-    user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await edit_post_json(
-        post_update=post_update, user_id=user.id, session=session
-    )
-
-
-@router.put("/view_post/{post_id}")
-async def view_post(
-    post_id: int,
-    user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await view_post_json(post_id=post_id, user_id=user.id, session=session)
-
-
-@router.put("/like_post/{post_id}")
-async def like_post(
-    post_id: int,
-    user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await like_post_json(post_id=post_id, user_id=user.id, session=session)
-
-
-@router.put("/dislike_post/{post_id}")
-async def dislike_post(
-    post_id: int,
-    user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await dislike_post_json(post_id=post_id, user_id=user.id, session=session)
-
-
-@router.delete("/remove_the_reaction/{post_id}")
-async def remove_the_reaction(
-    post_id: int,
-    user: User = Depends(current_user),
-    session: AsyncSession = Depends(get_async_session),
-) -> dict:
-    return await remove_the_reaction_json(
-        post_id=post_id, user_id=user.id, session=session
-    )
+from typing import Any, List, Optional, Union
+
+from fastapi import APIRouter, Body, Depends, Header, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.base_config import current_user
+from src.auth.models import User
+from src.config import POSTS_PAGE_MAX_SIZE, POSTS_PAGE_SIZE, TRENDING_SIZE
+from src.database import get_async_session, get_read_session
+from src.feed.etag import conditional_response, etag_matches, not_modified
+from src.feed.responses import ORJSONRoute
+from src.feed.schemas import PostCreate, PostUpdate, ReactionOperation
+from src.feed.utils import (
+    apply_reactions_json,
+    create_post_json,
+    create_posts_json,
+    delete_post_json,
+    delete_posts_json,
+    dislike_post_json,
+    edit_post_json,
+    export_posts_ndjson,
+    follow_user_json,
+    get_home_feed_json,
+    get_likes_by_post_id_json,
+    get_likes_by_post_ids_json,
+    get_post_by_post_id_json,
+    get_post_etag,
+    get_posts_by_user_id_json,
+    get_posts_etag,
+    get_trending_posts_json,
+    like_post_json,
+    remove_the_reaction_json,
+    search_posts_json,
+    unfollow_user_json,
+    view_post_json,
+)
+from src.utils import STATUS, return_json
+
+router = APIRouter(default_response_class=ORJSONResponse, route_class=ORJSONRoute)
+
+
+@router.get("/get_post/{post_id}")
+async def get_post_by_post_id(
+    post_id: int,
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_read_session),
+) -> Response:
+    if if_none_match is not None:
+        etag = await get_post_etag(post_id=post_id, session=session)
+        if etag is not None and etag_matches(etag, if_none_match):
+            return not_modified(etag)
+    return conditional_response(
+        await get_post_by_post_id_json(post_id=post_id, session=session),
+        if_none_match=if_none_match,
+    )
+
+
+@router.get("/get_reactions/{post_id}")
+async def get_reactions_by_post_id(
+    post_id: int,
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    return await get_likes_by_post_id_json(post_id=post_id, session=session)
+
+
+@router.get("/get_reactions")
+async def get_reactions_by_post_ids(
+    post_ids: List[int] = Query(),
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    return await get_likes_by_post_ids_json(post_ids=post_ids, session=session)
+
+
+@router.get("/get_posts/{user_id}")
+async def get_posts_by_user_id(
+    user_id: int,
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_PAGE_MAX_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_read_session),
+) -> Response:
+    if if_none_match is not None:
+        etag = await get_posts_etag(
+            user_id=user_id, session=session, limit=limit, cursor=cursor
+        )
+        if etag is not None and etag_matches(etag, if_none_match):
+            return not_modified(etag)
+    return conditional_response(
+        await get_posts_by_user_id_json(
+            user_id=user_id, session=session, limit=limit, cursor=cursor
+        ),
+        if_none_match=if_none_match,
+    )
+
+
+@router.get("/search")
+async def search_posts(
+    query: str = Query(min_length=1),
+    user_id: Optional[int] = None,
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_PAGE_MAX_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    return await search_posts_json(
+        query=query, session=session, user_id=user_id, limit=limit, cursor=cursor
+    )
+
+
+@router.get("/trending")
+async def get_trending_posts(
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=TRENDING_SIZE),
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    return await get_trending_posts_json(session=session, limit=limit)
+
+
+@router.get("/home")
+async def get_home_feed(
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_PAGE_MAX_SIZE),
+    cursor: Optional[str] = None,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await get_home_feed_json(
+        user_id=user.id, session=session, limit=limit, cursor=cursor
+    )
+
+
+@router.get("/export_posts")
+async def export_posts(
+    user_id: Optional[int] = None,
+    all_users: bool = False,
+    user: User = Depends(current_user),
+) -> Union[dict, StreamingResponse]:
+    """
+    Exports the posts of the current user. Superusers can export the posts
+    of another user or, with all_users, of all users.
+    """
+    if all_users:
+        user_id = None
+    elif user_id is None:
+        user_id = user.id
+    if user_id != user.id and not user.is_superuser:
+        return return_json(
+            status=STATUS[400],
+            message=f"Пользователь #{user.id} не имеет права выгружать чужие посты",
+        )
+    return StreamingResponse(
+        export_posts_ndjson(user_id=user_id), media_type="application/x-ndjson"
+    )
+
+
+@router.post("/create_post")
+async def create_post(
+    post_to_create: PostCreate,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await create_post_json(
+        post_to_create=post_to_create, user_id=user.id, session=session
+    )
+
+
+@router.post("/create_posts")
+async def create_posts(
+    posts_to_create: List[Any] = Body(),
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await create_posts_json(
+        posts_to_create=posts_to_create, user_id=user.id, session=session
+    )
+
+
+@router.delete("/delete_post/{post_id}")
+async def delete_post(
+    post_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await delete_post_json(post_id=post_id, user_id=user.id, session=session)
+
+
+@router.delete("/delete_posts")
+async def delete_posts(
+    post_ids: List[int] = Body(),
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await delete_posts_json(post_ids=post_ids, user_id=user.id, session=session)
+
+
+@router.put("/edit_post/{post_id}")
+async def edit_post(
+    post_update: PostUpdate,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await edit_post_json(
+        post_update=post_update, user_id=user.id, session=session
+    )
+
+
+@router.put("/view_post/{post_id}")
+async def view_post(
+    post_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await view_post_json(post_id=post_id, user_id=user.id, session=session)
+
+
+@router.put("/like_post/{post_id}")
+async def like_post(
+    post_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await like_post_json(post_id=post_id, user_id=user.id, session=session)
+
+
+@router.put("/dislike_post/{post_id}")
+async def dislike_post(
+    post_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await dislike_post_json(post_id=post_id, user_id=user.id, session=session)
+
+
+@router.delete("/remove_the_reaction/{post_id}")
+async def remove_the_reaction(
+    post_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await remove_the_reaction_json(
+        post_id=post_id, user_id=user.id, session=session
+    )
+
+
+@router.put("/apply_reactions")
+async def apply_reactions(
+    operations: List[ReactionOperation],
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await apply_reactions_json(
+        operations=operations, user_id=user.id, session=session
+    )
+
+
+@router.put("/follow/{user_id}")
+async def follow_user(
+    user_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await follow_user_json(followee_id=user_id, user_id=user.id, session=session)
+
+
+@router.delete("/unfollow/{user_id}")
+async def unfollow_user(
+    user_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    return await unfollow_user_json(
+        followee_id=user_id, user_id=user.id, session=session
+    )
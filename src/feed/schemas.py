@@ -1,20 +1,33 @@
-from pydantic import BaseModel
-
-
-class PostCreate(BaseModel):
-    title: str
-    text: str
-
-
-class PostRead(BaseModel):
-    id: int
-    title: str
-    text: str
-    views: int
-    user_id: int
-
-
-class PostUpdate(BaseModel):
-    id: int
-    title: str
-    text: str
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class PostCreate(BaseModel):
+    title: str
+    text: str
+
+
+class PostRead(BaseModel):
+    id: int
+    title: str
+    text: str
+    views: int
+    user_id: int
+
+
+class PostUpdate(BaseModel):
+    id: int
+    title: str
+    text: str
+
+
+class ReactionAction(str, Enum):
+    like = "like"
+    dislike = "dislike"
+    remove = "remove"
+
+
+class ReactionOperation(BaseModel):
+    post_id: int
+    action: ReactionAction
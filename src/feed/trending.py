@@ -0,0 +1,98 @@
+import asyncio
+import math
+import time
+from typing import List, Optional
+
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import TREND_HALF_LIFE, TRENDING_REFRESH_INTERVAL, TRENDING_SIZE
+from src.feed.models import post
+
+# scores below it are ranked as it, the logarithm needs a positive score
+MIN_TREND_SCORE = 0.001
+
+
+def decayed_trend_score():
+    """The trend score of the post decayed from trend_updated_at to now()."""
+    elapsed = func.extract(
+        "epoch", func.coalesce(post.c.trend_updated_at, func.now()) - func.now()
+    )
+    return post.c.trend_score * func.power(2.0, cast(elapsed, Float) / TREND_HALF_LIFE)
+
+
+def trend_values(weight) -> dict:
+    """
+    Values for an UPDATE of post which add the weight to the trend score.
+
+    The score is decayed to now() and trend_rank is set to
+    log2(score) + now() / TREND_HALF_LIFE: it is the logarithm of the score
+    decayed to any common moment plus a constant, so posts updated at
+    different times are ordered by the index without being rescored.
+    """
+    score = decayed_trend_score() + weight
+    epoch = cast(func.extract("epoch", func.now()), Float)
+    return {
+        "trend_score": score,
+        "trend_updated_at": func.now(),
+        "trend_rank": func.ln(func.greatest(score, MIN_TREND_SCORE)) / math.log(2)
+        + epoch / TREND_HALF_LIFE,
+    }
+
+
+class TrendingPosts:
+    """
+    Top posts by trend score kept in memory of the worker.
+
+    The list is reloaded by one scan of ix_post_trend_rank at most every
+    refresh_interval seconds when it is requested, so reading it costs the
+    same whatever the number of posts is.
+    """
+
+    def __init__(
+        self,
+        size: int = TRENDING_SIZE,
+        refresh_interval: float = TRENDING_REFRESH_INTERVAL,
+    ):
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self._posts: List[dict] = []
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def expired(self) -> bool:
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at >= self.refresh_interval
+        )
+
+    async def get(self, session: AsyncSession, limit: int) -> List[dict]:
+        if self.expired():
+            async with self._lock:
+                if self.expired():
+                    await self.refresh(session=session)
+        return self._posts[:limit]
+
+    async def refresh(self, session: AsyncSession) -> None:
+        result = await session.execute(
+            select(
+                post.c.id,
+                post.c.title,
+                post.c.text,
+                post.c.views,
+                post.c.user_id,
+                decayed_trend_score().label("trend_score"),
+            )
+            .where(post.c.trend_rank.is_not(None))
+            .order_by(post.c.trend_rank.desc())
+            .limit(self.size)
+        )
+        self._posts = [row._asdict() for row in result.all()]
+        self._loaded_at = time.monotonic()
+
+    def clear(self) -> None:
+        self._posts = []
+        self._loaded_at = None
+
+
+trending_posts = TrendingPosts()
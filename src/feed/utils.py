@@ -1,447 +1,1408 @@
-from typing import List, Optional
-
-from sqlalchemy import delete, select, update
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from src.auth.models import User
-from src.feed.models import Post, UserPost, post, user_post
-from src.feed.schemas import PostCreate, PostRead, PostUpdate
-from src.utils import STATUS, logger, return_json
-
-
-@logger.catch
-async def get_post_by_id(post_id: int, session: AsyncSession) -> Optional[Post]:
-    try:
-        posts = await session.execute(select(post).filter_by(id=post_id))
-        row = posts.one()
-        gotten_post = Post(
-            id=row.id,
-            title=row.title,
-            text=row.text,
-            views=row.views,
-            user_id=row.user_id,
-        )
-        return gotten_post
-    except Exception as e:
-        logger.error(str(e))
-        return None
-
-
-@logger.catch
-def create_dict_from_post_data(post_data: Post) -> dict:
-    return {
-        "id": post_data.id,
-        "title": post_data.title,
-        "text": post_data.text,
-        "views": post_data.views,
-        "user_id": post_data.user_id,
-    }
-
-
-@logger.catch
-async def get_post_by_post_id_json(post_id: int, session: AsyncSession):
-    try:
-        post_data = await get_post_by_id(post_id=post_id, session=session)
-        if post_data is not None:
-            data = [create_dict_from_post_data(post_data=post_data)]
-            return return_json(status=STATUS[200], data=data)
-        else:
-            return return_json(status=STATUS[400], message=f"Пост #{post_id} не найден")
-    except Exception as e:
-        logger.error(e)
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при получении поста #{post_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def get_posts_by_user_id_json(user_id: int, session: AsyncSession) -> dict:
-    try:
-        posts = await session.execute(select(post).filter_by(user_id=user_id))
-        data = posts.all()
-        post_read_data = []
-
-        for row in data:
-            post_read_data.append(
-                PostRead(
-                    id=row.id,
-                    title=row.title,
-                    text=row.text,
-                    views=row.views,
-                    user_id=row.user_id,
-                ).dict()
-            )
-
-        return return_json(status=STATUS[200], data=post_read_data)
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при получении постов пользователя #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def create_post_json(
-    post_to_create: PostCreate, user_id: int, session: AsyncSession
-) -> dict:
-    try:
-        new_post = Post(
-            title=post_to_create.title, text=post_to_create.text, user_id=user_id
-        )
-        session.add(new_post)
-        await session.commit()
-        return return_json(
-            status=STATUS[200],
-            message=f"Пользователь #{user_id} успешно опубликовал пост",
-        )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при публикации поста пользователем #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def delete_post_json(post_id: int, user_id: int, session: AsyncSession) -> dict:
-    try:
-        gotten_post = await get_post_by_id(post_id=post_id, session=session)
-        if gotten_post is not None:
-            if gotten_post.user_id == user_id:
-                statement = delete(UserPost).where(UserPost.post_id == post_id)
-                await session.execute(statement)
-                await session.commit()
-                statement = delete(Post).where(Post.id == post_id)
-                await session.execute(statement)
-                await session.commit()
-                return return_json(
-                    status=STATUS[200],
-                    message=f"Пост #{post_id} успешно удален",
-                )
-            else:
-                return return_json(
-                    status=STATUS[400],
-                    message=f"Пользователь #{user_id} не имеет права удалять пост #{post_id}",
-                )
-        else:
-            return return_json(
-                status=STATUS[400],
-                message=f"Пост #{post_id} не существует",
-            )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при удалении поста #{post_id} пользователем #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def edit_post_json(
-    post_update: PostUpdate,
-    user_id: int,
-    session: AsyncSession,
-) -> dict:
-    try:
-        post_id = post_update.id
-        gotten_post = await get_post_by_id(post_id=post_id, session=session)
-        if gotten_post is not None:
-            if gotten_post.user_id == user_id:
-                statement = (
-                    update(Post)
-                    .where(Post.id == post_id)
-                    .values(title=post_update.title, text=post_update.text)
-                )
-                await session.execute(statement)
-                await session.commit()
-                return return_json(
-                    status=STATUS[200],
-                    message=f"Пост #{post_id} успешно изменён пользователем #{user_id}",
-                )
-            else:
-                return return_json(
-                    status=STATUS[400],
-                    message=f"Пользователь #{user_id} не имеет права изменять пост #{post_id}",
-                )
-        else:
-            return return_json(
-                status=STATUS[400],
-                message=f"Пост #{post_id} не существует",
-            )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при изменении поста #{post_update.id} пользователем #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def view_post_json(
-    post_id: int,
-    user_id: int,
-    session: AsyncSession,
-) -> dict:
-    try:
-        gotten_post = await get_post_by_id(post_id=post_id, session=session)
-        if gotten_post is not None:
-            statement = (
-                update(Post)
-                .where(Post.id == post_id)
-                .values(views=gotten_post.views + 1)
-            )
-            await session.execute(statement)
-            await session.commit()
-            return return_json(
-                status=STATUS[200],
-                message=f"Пост #{post_id} успешно просмотрем пользователем #{user_id}",
-            )
-
-        else:
-            return return_json(
-                status=STATUS[400],
-                message=f"Пост #{post_id} не существует",
-            )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при просмотре поста #{post_id} пользователем #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def get_user_post(
-    user_id: int, post_id: int, session: AsyncSession
-) -> Optional[UserPost]:
-    try:
-        existing_user_post = await session.execute(
-            select(user_post).filter_by(user_id=user_id, post_id=post_id)
-        )
-        row = existing_user_post.one()
-        gotten_user_post = UserPost(
-            user_id=row.user_id,
-            post_id=row.post_id,
-            like=row.like,
-        )
-        return gotten_user_post
-    except Exception as e:
-        logger.error(str(e))
-        return None
-
-
-@logger.catch
-async def like_post_json(
-    post_id: int,
-    user_id: int,
-    session: AsyncSession,
-) -> dict:
-    try:
-        existing_user_post = await get_user_post(
-            user_id=user_id, post_id=post_id, session=session
-        )
-        if existing_user_post is None:
-            gotten_post = await get_post_by_id(post_id=post_id, session=session)
-            if gotten_post.user_id == user_id:
-                return return_json(
-                    status=STATUS[400],
-                    message=f"Пользователь #{user_id} попытался поставить реакцию на свой пост #{post_id} ",
-                )
-            else:
-                new_user_post = UserPost(user_id=user_id, post_id=post_id, like=True)
-                session.add(new_user_post)
-                await session.commit()
-                return return_json(
-                    status=STATUS[200],
-                    message=f"Пользователь #{user_id} успешно поставил лайк на пост #{post_id}",
-                )
-        elif existing_user_post.like:
-            return return_json(
-                status=STATUS[200],
-                message=f"Пользователь #{user_id} уже ставил лайк на пост #{post_id}",
-            )
-        else:
-            statement = (
-                update(UserPost)
-                .where(UserPost.user_id == user_id and UserPost.post_id == post_id)
-                .values(like=True)
-            )
-            await session.execute(statement)
-            await session.commit()
-            return return_json(
-                status=STATUS[200],
-                message=f"Пользователь #{user_id} убрал дизлайк и поставил лайк на пост #{post_id}",
-            )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при попытке поставить лайк на пост #{post_id} пользователем #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def dislike_post_json(
-    post_id: int,
-    user_id: int,
-    session: AsyncSession,
-) -> dict:
-    try:
-        existing_user_post = await get_user_post(
-            user_id=user_id, post_id=post_id, session=session
-        )
-        if existing_user_post is None:
-            gotten_post = await get_post_by_id(post_id=post_id, session=session)
-            if gotten_post.user_id == user_id:
-                return return_json(
-                    status=STATUS[400],
-                    message=f"Пользователь #{user_id} попытался поставить реакцию на свой пост #{post_id} ",
-                )
-            else:
-                new_user_post = UserPost(user_id=user_id, post_id=post_id, like=False)
-                session.add(new_user_post)
-                await session.commit()
-                return return_json(
-                    status=STATUS[200],
-                    message=f"Пользователь #{user_id} успешно поставил дизлайк на пост #{post_id}",
-                )
-        elif not existing_user_post.like:
-            return return_json(
-                status=STATUS[200],
-                message=f"Пользователь #{user_id} уже ставил дизлайк на пост #{post_id}",
-            )
-        else:
-            statement = (
-                update(UserPost)
-                .where(UserPost.user_id == user_id and UserPost.post_id == post_id)
-                .values(like=False)
-            )
-            await session.execute(statement)
-            await session.commit()
-            return return_json(
-                status=STATUS[200],
-                message=f"Пользователь #{user_id} убрал лайк и поставил дизлайк на пост #{post_id}",
-            )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при попытке поставить дизлайк на пост #{post_id} пользователем #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def remove_the_reaction_json(
-    post_id: int,
-    user_id: int,
-    session: AsyncSession,
-) -> dict:
-    try:
-        existing_user_post = await get_user_post(
-            user_id=user_id, post_id=post_id, session=session
-        )
-        if existing_user_post is None:
-            return return_json(
-                status=STATUS[400],
-                message=f"Пользователь #{user_id} ещё не ставил реакцию на пост #{post_id}",
-            )
-        else:
-            statement = delete(UserPost).where(
-                UserPost.user_id == user_id and UserPost.post_id == post_id
-            )
-            await session.execute(statement)
-            await session.commit()
-            return return_json(
-                status=STATUS[200],
-                message=f"Пользователь #{user_id} убрал реакцию на пост #{post_id}",
-            )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при попытке убрать реакцию на пост #{post_id} пользователем #{user_id}",
-            details=str(e),
-        )
-
-
-@logger.catch
-async def get_all_user_post_by_post_id(
-    post_id: int, session: AsyncSession
-) -> Optional[List[UserPost]]:
-    try:
-        existing_user_post = await session.execute(
-            select(user_post).filter_by(post_id=post_id)
-        )
-        data = existing_user_post.all()
-        gotten_user_post = []
-        for row in data:
-            gotten_user_post.append(
-                UserPost(
-                    user_id=row.user_id,
-                    post_id=row.post_id,
-                    like=row.like,
-                )
-            )
-        return gotten_user_post
-    except Exception as e:
-        logger.error(str(e))
-        return None
-
-
-@logger.catch
-async def get_likes_by_post_id_json(
-    post_id: int,
-    session: AsyncSession,
-) -> dict:
-    try:
-        gotten_post = await get_post_by_id(post_id=post_id, session=session)
-        if gotten_post is not None:
-            existing_user_post = await get_all_user_post_by_post_id(
-                post_id=post_id, session=session
-            )
-            if existing_user_post is not None:
-                likes_count = sum(
-                    1
-                    for user_post_element in existing_user_post
-                    if user_post_element.like
-                )
-                dislikes_count = len(existing_user_post) - likes_count
-                data = [
-                    {
-                        "total_reactions": len(existing_user_post),
-                        "likes": likes_count,
-                        "dislikes": dislikes_count,
-                    }
-                ]
-                return return_json(
-                    status=STATUS[200],
-                    message=f"Успешно получены реакции на пост #{post_id}",
-                    data=data,
-                )
-            else:
-                return return_json(
-                    status=STATUS[200],
-                    message=f"На данный момент нет реакций на пост #{post_id}",
-                )
-        else:
-            return return_json(
-                status=STATUS[400],
-                message=f"Пост #{post_id} не найден",
-            )
-    except Exception as e:
-        logger.error(str(e))
-        return return_json(
-            status=STATUS[400],
-            message=f"Произошла ошибка при попытке получить реакции на пост #{post_id}",
-            details=str(e),
-        )
+import base64
+import json
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import (
+    Boolean,
+    Integer,
+    Row,
+    case,
+    column,
+    delete,
+    func,
+    literal,
+    literal_column,
+    not_,
+    or_,
+    select,
+    true,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import User
+from src.config import (
+    EXPORT_CHUNK_SIZE,
+    FEED_BATCH_MAX_SIZE,
+    POSTS_BULK_CHUNK_SIZE,
+    POSTS_BULK_MAX_SIZE,
+    POSTS_PAGE_SIZE,
+    REACTIONS_BULK_MAX_SIZE,
+    TIMELINE_BACKFILL_SIZE,
+    TIMELINE_FANOUT_MAX_FOLLOWERS,
+    TREND_DISLIKE_WEIGHT,
+    TREND_LIKE_WEIGHT,
+    TRENDING_SIZE,
+)
+from src.database import async_session_maker, is_replica_session
+from src.feed.cache import post_cache
+from src.feed.etag import versions_etag
+from src.feed.models import (
+    SEARCH_CONFIG,
+    Post,
+    UserPost,
+    follow,
+    post,
+    timeline,
+    user_post,
+)
+from src.feed.schemas import PostCreate, PostUpdate, ReactionAction, ReactionOperation
+from src.feed.trending import trend_values, trending_posts
+from src.feed.view_buffer import view_buffer
+from src.utils import STATUS, logger, return_json
+
+# largest value of the integer post ids
+MAX_POST_ID = 2**31 - 1
+
+
+@logger.catch
+async def get_post_by_id(post_id: int, session: AsyncSession) -> Optional[Post]:
+    try:
+        post_data = post_cache.get(post_id)
+        if post_data is None:
+            posts = await session.execute(
+                select(
+                    post.c.id,
+                    post.c.title,
+                    post.c.text,
+                    post.c.views,
+                    post.c.user_id,
+                    post.c.version,
+                ).filter_by(id=post_id)
+            )
+            post_data = posts.one()._asdict()
+            # a lagging replica would put back a row the primary has changed
+            if not is_replica_session(session):
+                post_cache.set(post_id, post_data)
+        gotten_post = Post(**post_data)
+        return gotten_post
+    except Exception as e:
+        logger.error(str(e))
+        return None
+
+
+@logger.catch
+def create_dict_from_post_data(post_data: Post) -> dict:
+    return {
+        "id": post_data.id,
+        "title": post_data.title,
+        "text": post_data.text,
+        "views": post_data.views,
+        "user_id": post_data.user_id,
+        "version": post_data.version,
+    }
+
+
+@logger.catch
+async def get_post_by_post_id_json(post_id: int, session: AsyncSession):
+    try:
+        post_data = await get_post_by_id(post_id=post_id, session=session)
+        if post_data is not None:
+            data = [create_dict_from_post_data(post_data=post_data)]
+            return return_json(status=STATUS[200], data=data)
+        else:
+            return return_json(status=STATUS[400], message=f"Пост #{post_id} не найден")
+    except Exception as e:
+        logger.error(e)
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при получении поста #{post_id}",
+            details=str(e),
+        )
+
+
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(isinstance(value, type_) for value, type_ in zip(values, types))
+    ):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def posts_page(statement, user_id: int, limit: int, cursor: Optional[str]):
+    """
+    Limits the select of posts to a page of the posts of the user from the
+    newest one. Raises ValueError for an invalid cursor.
+    """
+    statement = (
+        statement.where(post.c.user_id == user_id)
+        .order_by(post.c.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        (last_post_id,) = decode_cursor(cursor, int)
+        statement = statement.where(post.c.id < last_post_id)
+    return statement
+
+
+async def get_post_etag(post_id: int, session: AsyncSession) -> Optional[str]:
+    """
+    ETag of get_post_by_post_id_json from the cached post or the version of
+    the post only, None if the post does not exist.
+    """
+    try:
+        post_data = post_cache.get(post_id)
+        if post_data is None:
+            result = await session.execute(
+                select(post.c.id, post.c.version).where(post.c.id == post_id)
+            )
+            post_data = result.one_or_none()
+            if post_data is None:
+                return None
+            post_data = post_data._asdict()
+        return versions_etag([(post_data["id"], post_data["version"])], None)
+    except Exception as e:
+        logger.error(str(e))
+        return None
+
+
+async def get_posts_etag(
+    user_id: int,
+    session: AsyncSession,
+    limit: int = POSTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> Optional[str]:
+    """
+    ETag of get_posts_by_user_id_json from the ids and the versions of the
+    posts of the page only, None if the cursor is invalid.
+    """
+    try:
+        result = await session.execute(
+            posts_page(
+                select(post.c.id, post.c.version),
+                user_id=user_id,
+                limit=limit,
+                cursor=cursor,
+            )
+        )
+        versions = result.all()
+        next_cursor = (
+            encode_cursor(versions[limit - 1].id) if len(versions) > limit else None
+        )
+        return versions_etag(
+            [(row.id, row.version) for row in versions[:limit]], next_cursor
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return None
+
+
+@logger.catch
+async def get_posts_by_user_id_json(
+    user_id: int,
+    session: AsyncSession,
+    limit: int = POSTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> dict:
+    try:
+        try:
+            statement = posts_page(
+                select(
+                    post.c.id,
+                    post.c.title,
+                    post.c.text,
+                    post.c.views,
+                    post.c.user_id,
+                    post.c.version,
+                ),
+                user_id=user_id,
+                limit=limit,
+                cursor=cursor,
+            )
+        except ValueError:
+            return return_json(
+                status=STATUS[400],
+                message=f"Некорректный курсор для постов пользователя #{user_id}",
+            )
+        posts = await session.execute(statement)
+        data = posts.all()
+        post_read_data = [row._asdict() for row in data[:limit]]
+
+        return return_json(
+            status=STATUS[200],
+            data=post_read_data,
+            next_cursor=encode_cursor(data[limit - 1].id)
+            if len(data) > limit
+            else None,
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при получении постов пользователя #{user_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def search_posts_json(
+    query: str,
+    session: AsyncSession,
+    user_id: Optional[int] = None,
+    limit: int = POSTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    Finds the posts matching the query in the web search syntax by
+    ix_post_search_vector, optionally only the ones of the user, ordered by
+    relevance. Titles weigh more than texts.
+    """
+    try:
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = func.ts_rank(post.c.search_vector, ts_query)
+        statement = (
+            select(
+                post.c.id,
+                post.c.title,
+                post.c.text,
+                post.c.views,
+                post.c.user_id,
+                rank.label("rank"),
+            )
+            .where(post.c.search_vector.bool_op("@@")(ts_query))
+            .order_by(rank.desc(), post.c.id.desc())
+            .limit(limit + 1)
+        )
+        if user_id is not None:
+            statement = statement.where(post.c.user_id == user_id)
+        if cursor is not None:
+            try:
+                last_rank, last_post_id = decode_cursor(cursor, float, int)
+            except ValueError:
+                return return_json(
+                    status=STATUS[400],
+                    message=f"Некорректный курсор поиска постов по запросу «{query}»",
+                )
+            statement = statement.where(
+                tuple_(rank, post.c.id) < tuple_(last_rank, last_post_id)
+            )
+        posts = await session.execute(statement)
+        data = posts.all()
+
+        return return_json(
+            status=STATUS[200],
+            data=[row._asdict() for row in data[:limit]],
+            next_cursor=encode_cursor(data[limit - 1].rank, data[limit - 1].id)
+            if len(data) > limit
+            else None,
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при поиске постов по запросу «{query}»",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def get_trending_posts_json(
+    session: AsyncSession, limit: int = POSTS_PAGE_SIZE
+) -> dict:
+    try:
+        posts = await trending_posts.get(
+            session=session, limit=min(limit, TRENDING_SIZE)
+        )
+        return return_json(status=STATUS[200], data=posts)
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message="Произошла ошибка при получении популярных постов",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def get_home_feed_json(
+    user_id: int,
+    session: AsyncSession,
+    limit: int = POSTS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    Returns the newest posts of the authors followed by the user: the ones
+    pushed to the timeline of the user merged with the ones of the followed
+    authors that were not pushed.
+
+    Posts of authors with too many followers are not pushed at all, and the
+    ones an author published before falling below the threshold are not
+    pushed up to their unpushed_post_id. They are read per author by a
+    LATERAL range scan of ix_post_user_id_id.
+    """
+    try:
+        authors = User.__table__
+        columns = (post.c.id, post.c.title, post.c.text, post.c.views, post.c.user_id)
+        last_post_id = None
+        if cursor is not None:
+            try:
+                (last_post_id,) = decode_cursor(cursor, int)
+            except ValueError:
+                return return_json(
+                    status=STATUS[400],
+                    message=f"Некорректный курсор ленты пользователя #{user_id}",
+                )
+        pushed = (
+            select(*columns)
+            .join_from(timeline, post, post.c.id == timeline.c.post_id)
+            .where(timeline.c.user_id == user_id)
+            .order_by(timeline.c.post_id.desc())
+            .limit(limit + 1)
+        )
+        merged_authors = (
+            select(
+                follow.c.followee_id,
+                case(
+                    (
+                        authors.c.followers_count >= TIMELINE_FANOUT_MAX_FOLLOWERS,
+                        literal(MAX_POST_ID),
+                    ),
+                    else_=authors.c.unpushed_post_id,
+                ).label("merged_until"),
+            )
+            .join(authors, authors.c.id == follow.c.followee_id)
+            .where(
+                follow.c.follower_id == user_id,
+                or_(
+                    authors.c.followers_count >= TIMELINE_FANOUT_MAX_FOLLOWERS,
+                    authors.c.unpushed_post_id.is_not(None),
+                ),
+            )
+            .subquery("merged_authors")
+        )
+        merged_posts = (
+            select(*columns)
+            .where(
+                post.c.user_id == merged_authors.c.followee_id,
+                post.c.id <= merged_authors.c.merged_until,
+            )
+            .order_by(post.c.id.desc())
+            .limit(limit + 1)
+        )
+        if last_post_id is not None:
+            pushed = pushed.where(timeline.c.post_id < last_post_id)
+            merged_posts = merged_posts.where(post.c.id < last_post_id)
+        merged_posts = merged_posts.lateral("merged_posts")
+        merged = select(merged_posts).select_from(
+            merged_authors.join(merged_posts, true())
+        )
+        # a post can be both pushed and merged, DISTINCT ON drops it by id
+        feed = union_all(pushed, merged).subquery("feed")
+        posts = await session.execute(
+            select(feed).distinct(feed.c.id).order_by(feed.c.id.desc()).limit(limit + 1)
+        )
+        data = posts.all()
+
+        return return_json(
+            status=STATUS[200],
+            data=[row._asdict() for row in data[:limit]],
+            next_cursor=encode_cursor(data[limit - 1].id)
+            if len(data) > limit
+            else None,
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при получении ленты пользователя #{user_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def follow_user_json(
+    followee_id: int, user_id: int, session: AsyncSession
+) -> dict:
+    try:
+        if followee_id == user_id:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пользователь #{user_id} попытался подписаться на себя",
+            )
+        authors = User.__table__
+        target = (
+            select(authors.c.id, authors.c.followers_count)
+            .where(authors.c.id == followee_id)
+            .cte("target")
+        )
+        inserted = (
+            insert(follow)
+            .from_select(
+                ["follower_id", "followee_id"], select(literal(user_id), target.c.id)
+            )
+            .on_conflict_do_nothing()
+            .returning(follow.c.followee_id)
+            .cte("inserted")
+        )
+        counters = (
+            update(authors)
+            .where(authors.c.id == inserted.c.followee_id)
+            .values(followers_count=authors.c.followers_count + 1)
+            .returning(authors.c.id)
+            .cte("counters")
+        )
+        result = await session.execute(
+            select(target.c.followers_count, inserted.c.followee_id)
+            .select_from(target.outerjoin(inserted, true()))
+            .add_cte(counters)
+        )
+        followed = result.one_or_none()
+        if followed is None:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пользователь #{followee_id} не существует",
+            )
+        if followed.followee_id is None:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} уже подписан на пользователя #{followee_id}",
+            )
+        if followed.followers_count + 1 < TIMELINE_FANOUT_MAX_FOLLOWERS:
+            recent_posts = (
+                select(literal(user_id), post.c.id, post.c.user_id)
+                .where(post.c.user_id == followee_id)
+                .order_by(post.c.id.desc())
+                .limit(TIMELINE_BACKFILL_SIZE)
+            )
+            await session.execute(
+                insert(timeline)
+                .from_select(["user_id", "post_id", "author_id"], recent_posts)
+                .on_conflict_do_nothing()
+            )
+        await session.commit()
+        return return_json(
+            status=STATUS[200],
+            message=f"Пользователь #{user_id} подписался на пользователя #{followee_id}",
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при подписке пользователя #{user_id} на пользователя #{followee_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def unfollow_user_json(
+    followee_id: int, user_id: int, session: AsyncSession
+) -> dict:
+    try:
+        authors = User.__table__
+        deleted = (
+            delete(follow)
+            .where(follow.c.follower_id == user_id, follow.c.followee_id == followee_id)
+            .returning(follow.c.followee_id)
+            .cte("deleted")
+        )
+        counters = (
+            update(authors)
+            .where(authors.c.id == deleted.c.followee_id)
+            .values(
+                followers_count=authors.c.followers_count - 1,
+                # the posts of the author were not pushed until now, home
+                # feeds keep merging them in up to the newest one
+                unpushed_post_id=case(
+                    (
+                        authors.c.followers_count == TIMELINE_FANOUT_MAX_FOLLOWERS,
+                        select(func.max(post.c.id))
+                        .where(post.c.user_id == authors.c.id)
+                        .scalar_subquery(),
+                    ),
+                    else_=authors.c.unpushed_post_id,
+                ),
+            )
+            .returning(authors.c.id)
+            .cte("counters")
+        )
+        cleaned = (
+            delete(timeline)
+            .where(timeline.c.user_id == user_id, timeline.c.author_id == followee_id)
+            .returning(timeline.c.post_id)
+            .cte("cleaned")
+        )
+        result = await session.execute(
+            select(deleted.c.followee_id).add_cte(counters).add_cte(cleaned)
+        )
+        unfollowed = result.scalar_one_or_none()
+        await session.commit()
+        if unfollowed is None:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пользователь #{user_id} не подписан на пользователя #{followee_id}",
+            )
+        return return_json(
+            status=STATUS[200],
+            message=f"Пользователь #{user_id} отписался от пользователя #{followee_id}",
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при отписке пользователя #{user_id} от пользователя #{followee_id}",
+            details=str(e),
+        )
+
+
+async def export_posts_ndjson(
+    user_id: Optional[int] = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncGenerator[bytes, None]:
+    """
+    Yields the posts of the user (or of all users) as newline-delimited JSON,
+    one chunk of rows at a time, reading them through a server-side cursor.
+
+    Errors are raised after being logged: the response has already started,
+    so the server can only abort it and the client sees that it is cut off.
+    """
+    statement = select(
+        post.c.id,
+        post.c.title,
+        post.c.text,
+        post.c.views,
+        post.c.user_id,
+        post.c.version,
+    ).order_by(post.c.id)
+    if user_id is not None:
+        statement = statement.where(post.c.user_id == user_id)
+    try:
+        async with async_session_maker() as session:
+            result = await session.stream(
+                statement.execution_options(yield_per=chunk_size)
+            )
+            # plain str keys, orjson takes the quoted_name column names only
+            # with OPT_NON_STR_KEYS
+            keys = [str(key) for key in result.keys()]
+            async for rows in result.partitions():
+                yield b"".join(
+                    orjson.dumps(dict(zip(keys, row))) + b"\n" for row in rows
+                )
+    except Exception as e:
+        logger.error(str(e))
+        raise
+
+
+@logger.catch
+async def create_post_json(
+    post_to_create: PostCreate, user_id: int, session: AsyncSession
+) -> dict:
+    try:
+        new_post = Post(
+            title=post_to_create.title, text=post_to_create.text, user_id=user_id
+        )
+        session.add(new_post)
+        await session.flush()
+        await fan_out_posts(post_ids=[new_post.id], session=session)
+        await session.commit()
+        return return_json(
+            status=STATUS[200],
+            message=f"Пользователь #{user_id} успешно опубликовал пост",
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при публикации поста пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+async def fan_out_posts(post_ids: List[int], session: AsyncSession) -> None:
+    """
+    Adds the posts to the timelines of the followers of their authors without
+    committing it. Posts of authors with TIMELINE_FANOUT_MAX_FOLLOWERS
+    followers or more are skipped, home feeds merge them in when read.
+    """
+    authors = User.__table__
+    statement = insert(timeline).from_select(
+        ["user_id", "post_id", "author_id"],
+        select(follow.c.follower_id, post.c.id, post.c.user_id)
+        .join(follow, follow.c.followee_id == post.c.user_id)
+        .join(authors, authors.c.id == post.c.user_id)
+        .where(
+            post.c.id.in_(post_ids),
+            authors.c.followers_count < TIMELINE_FANOUT_MAX_FOLLOWERS,
+        ),
+    )
+    await session.execute(statement.on_conflict_do_nothing())
+
+
+@logger.catch
+async def create_posts_json(
+    posts_to_create: List[Any], user_id: int, session: AsyncSession
+) -> dict:
+    try:
+        if len(posts_to_create) > POSTS_BULK_MAX_SIZE:
+            return return_json(
+                status=STATUS[400],
+                message=f"Можно опубликовать не более {POSTS_BULK_MAX_SIZE} постов за раз",
+            )
+        data = []
+        rows = []
+        for index, post_to_create in enumerate(posts_to_create):
+            data.append({"index": index, "id": None, "errors": None})
+            try:
+                post_to_create = PostCreate.parse_obj(post_to_create)
+            except ValidationError as e:
+                data[index]["errors"] = e.errors()
+                continue
+            rows.append(
+                {
+                    "title": post_to_create.title,
+                    "text": post_to_create.text,
+                    "user_id": user_id,
+                }
+            )
+        created = [item for item in data if item["errors"] is None]
+        for start in range(0, len(rows), POSTS_BULK_CHUNK_SIZE):
+            result = await session.execute(
+                insert(post).returning(post.c.id, sort_by_parameter_order=True),
+                rows[start : start + POSTS_BULK_CHUNK_SIZE],
+            )
+            for item, post_id in zip(created[start:], result.scalars()):
+                item["id"] = post_id
+        if created:
+            await fan_out_posts(
+                post_ids=[item["id"] for item in created], session=session
+            )
+        await session.commit()
+        return return_json(
+            status=STATUS[200],
+            message=f"Пользователь #{user_id} опубликовал постов: {len(created)}, "
+            f"с ошибками: {len(data) - len(created)}",
+            data=data,
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при публикации постов пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+def delete_owned_posts(post_ids: List[int], user_id: int):
+    """
+    Statement which deletes the posts of the user among post_ids, their
+    reactions and timeline entries go with them by the foreign keys.
+
+    Returns a row for every existing post with its author_id and deleted_id,
+    which is None if the post belongs to another user.
+    """
+    target = (
+        select(post.c.id, post.c.user_id).where(post.c.id.in_(post_ids)).cte("target")
+    )
+    deleted = (
+        delete(post)
+        .where(post.c.id == target.c.id, target.c.user_id == user_id)
+        .returning(post.c.id)
+        .cte("deleted")
+    )
+    return select(
+        target.c.id,
+        target.c.user_id.label("author_id"),
+        deleted.c.id.label("deleted_id"),
+    ).select_from(target.outerjoin(deleted, deleted.c.id == target.c.id))
+
+
+@logger.catch
+async def delete_post_json(post_id: int, user_id: int, session: AsyncSession) -> dict:
+    try:
+        result = await session.execute(delete_owned_posts([post_id], user_id))
+        deleted = result.one_or_none()
+        await session.commit()
+        if deleted is None:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пост #{post_id} не существует",
+            )
+        if deleted.deleted_id is None:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пользователь #{user_id} не имеет права удалять пост #{post_id}",
+            )
+        post_cache.invalidate(post_id)
+        return return_json(
+            status=STATUS[200],
+            message=f"Пост #{post_id} успешно удален",
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при удалении поста #{post_id} пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def delete_posts_json(
+    post_ids: List[int], user_id: int, session: AsyncSession
+) -> dict:
+    """
+    Deletes many posts of the user in one statement and one transaction.
+
+    Every requested post gets one result, however many times it is
+    repeated: "deleted", "not_found" or "forbidden" if it belongs to
+    another user.
+    """
+    try:
+        post_ids = list(dict.fromkeys(post_ids))
+        if len(post_ids) > POSTS_BULK_MAX_SIZE:
+            return return_json(
+                status=STATUS[400],
+                message=f"Можно удалить не более {POSTS_BULK_MAX_SIZE} постов за раз",
+            )
+        result = await session.execute(delete_owned_posts(post_ids, user_id))
+        rows = {row.id: row for row in result.all()}
+        await session.commit()
+
+        data = []
+        for post_id in post_ids:
+            row = rows.get(post_id)
+            if row is None:
+                outcome = "not_found"
+            elif row.deleted_id is None:
+                outcome = "forbidden"
+            else:
+                outcome = "deleted"
+                post_cache.invalidate(post_id)
+            data.append({"post_id": post_id, "result": outcome})
+        deleted_count = sum(item["result"] == "deleted" for item in data)
+        return return_json(
+            status=STATUS[200],
+            message=f"Пользователь #{user_id} удалил постов: {deleted_count} из {len(post_ids)}",
+            data=data,
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при удалении постов пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def edit_post_json(
+    post_update: PostUpdate,
+    user_id: int,
+    session: AsyncSession,
+) -> dict:
+    try:
+        post_id = post_update.id
+        gotten_post = await get_post_by_id(post_id=post_id, session=session)
+        if gotten_post is not None:
+            if gotten_post.user_id == user_id:
+                statement = (
+                    update(Post)
+                    .where(Post.id == post_id)
+                    .values(
+                        title=post_update.title,
+                        text=post_update.text,
+                        version=Post.version + 1,
+                    )
+                )
+                await session.execute(statement)
+                await session.commit()
+                post_cache.invalidate(post_id)
+                return return_json(
+                    status=STATUS[200],
+                    message=f"Пост #{post_id} успешно изменён пользователем #{user_id}",
+                )
+            else:
+                return return_json(
+                    status=STATUS[400],
+                    message=f"Пользователь #{user_id} не имеет права изменять пост #{post_id}",
+                )
+        else:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пост #{post_id} не существует",
+            )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при изменении поста #{post_update.id} пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def view_post_json(
+    post_id: int,
+    user_id: int,
+    session: AsyncSession,
+) -> dict:
+    try:
+        gotten_post = await get_post_by_id(post_id=post_id, session=session)
+        if gotten_post is not None:
+            await view_buffer.record(post_id=post_id, session=session)
+            return return_json(
+                status=STATUS[200],
+                message=f"Пост #{post_id} успешно просмотрем пользователем #{user_id}",
+            )
+
+        else:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пост #{post_id} не существует",
+            )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при просмотре поста #{post_id} пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+async def upsert_reaction(
+    post_id: int, user_id: int, like: bool, session: AsyncSession
+) -> Optional[Row]:
+    """
+    Sets the reaction of the user on the post in a single statement.
+
+    Returns None if the post does not exist, otherwise a row with the
+    author_id of the post and the inserted flag: True for a new reaction,
+    False for a changed one and None if nothing was changed (the reaction
+    was already the same or the post belongs to the user). The reaction
+    counters of the post are updated by the same statement.
+    """
+    target = select(post.c.id, post.c.user_id).where(post.c.id == post_id).cte("target")
+    statement = insert(user_post).from_select(
+        ["user_id", "post_id", "like"],
+        select(literal(user_id), target.c.id, literal(like)).where(
+            target.c.user_id.is_distinct_from(user_id)
+        ),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[user_post.c.user_id, user_post.c.post_id],
+        set_={"like": statement.excluded.like},
+        where=user_post.c.like.is_distinct_from(statement.excluded.like),
+    )
+    upsert = statement.returning(
+        user_post.c.post_id, literal_column("xmax = 0").label("inserted")
+    ).cte("upsert")
+    replaced = case((upsert.c.inserted, 0), else_=1)
+    counters = (
+        update(post)
+        .where(post.c.id == upsert.c.post_id)
+        .values(
+            version=post.c.version + 1,
+            likes_count=post.c.likes_count + (1 if like else -replaced),
+            dislikes_count=post.c.dislikes_count + (-replaced if like else 1),
+            **trend_values(
+                TREND_LIKE_WEIGHT - replaced * TREND_DISLIKE_WEIGHT
+                if like
+                else TREND_DISLIKE_WEIGHT - replaced * TREND_LIKE_WEIGHT
+            ),
+        )
+        .returning(post.c.id)
+        .cte("counters")
+    )
+    result = await session.execute(
+        select(target.c.user_id.label("author_id"), upsert.c.inserted)
+        .select_from(target.outerjoin(upsert, true()))
+        .add_cte(counters)
+    )
+    reaction = result.one_or_none()
+    await session.commit()
+    if reaction is not None and reaction.inserted is not None:
+        post_cache.invalidate(post_id)
+    return reaction
+
+
+@logger.catch
+async def like_post_json(
+    post_id: int,
+    user_id: int,
+    session: AsyncSession,
+) -> dict:
+    try:
+        reaction = await upsert_reaction(
+            post_id=post_id, user_id=user_id, like=True, session=session
+        )
+        if reaction is None:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пост #{post_id} не существует",
+            )
+        elif reaction.author_id == user_id:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пользователь #{user_id} попытался поставить реакцию на свой пост #{post_id} ",
+            )
+        elif reaction.inserted is None:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} уже ставил лайк на пост #{post_id}",
+            )
+        elif reaction.inserted:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} успешно поставил лайк на пост #{post_id}",
+            )
+        else:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} убрал дизлайк и поставил лайк на пост #{post_id}",
+            )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при попытке поставить лайк на пост #{post_id} пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def dislike_post_json(
+    post_id: int,
+    user_id: int,
+    session: AsyncSession,
+) -> dict:
+    try:
+        reaction = await upsert_reaction(
+            post_id=post_id, user_id=user_id, like=False, session=session
+        )
+        if reaction is None:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пост #{post_id} не существует",
+            )
+        elif reaction.author_id == user_id:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пользователь #{user_id} попытался поставить реакцию на свой пост #{post_id} ",
+            )
+        elif reaction.inserted is None:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} уже ставил дизлайк на пост #{post_id}",
+            )
+        elif reaction.inserted:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} успешно поставил дизлайк на пост #{post_id}",
+            )
+        else:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} убрал лайк и поставил дизлайк на пост #{post_id}",
+            )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при попытке поставить дизлайк на пост #{post_id} пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+async def delete_reaction(
+    post_id: int, user_id: int, session: AsyncSession
+) -> Optional[bool]:
+    """
+    Deletes the reaction of the user on the post and updates the reaction
+    counters of the post in a single statement.
+
+    Returns the removed reaction (True for a like) or None if there was none.
+    """
+    deleted = (
+        delete(user_post)
+        .where(user_post.c.user_id == user_id, user_post.c.post_id == post_id)
+        .returning(user_post.c.post_id, user_post.c.like)
+        .cte("deleted")
+    )
+    counters = (
+        update(post)
+        .where(post.c.id == deleted.c.post_id)
+        .values(
+            version=post.c.version + 1,
+            likes_count=post.c.likes_count - case((deleted.c.like, 1), else_=0),
+            dislikes_count=post.c.dislikes_count - case((deleted.c.like, 0), else_=1),
+            **trend_values(
+                -case((deleted.c.like, TREND_LIKE_WEIGHT), else_=TREND_DISLIKE_WEIGHT)
+            ),
+        )
+        .returning(post.c.id)
+        .cte("counters")
+    )
+    result = await session.execute(select(deleted.c.like).add_cte(counters))
+    like = result.scalar_one_or_none()
+    await session.commit()
+    if like is not None:
+        post_cache.invalidate(post_id)
+    return like
+
+
+@logger.catch
+async def remove_the_reaction_json(
+    post_id: int,
+    user_id: int,
+    session: AsyncSession,
+) -> dict:
+    try:
+        removed_like = await delete_reaction(
+            post_id=post_id, user_id=user_id, session=session
+        )
+        if removed_like is None:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пользователь #{user_id} ещё не ставил реакцию на пост #{post_id}",
+            )
+        else:
+            return return_json(
+                status=STATUS[200],
+                message=f"Пользователь #{user_id} убрал реакцию на пост #{post_id}",
+            )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при попытке убрать реакцию на пост #{post_id} пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+async def upsert_reactions(
+    reactions: Dict[int, bool], user_id: int, session: AsyncSession
+) -> Dict[int, Row]:
+    """
+    Sets the reactions of the user on many posts (post id -> like) in a
+    single statement without committing it.
+
+    Returns a row with the author_id and the inserted flag (see
+    upsert_reaction) for every existing post.
+    """
+    reaction_values = values(
+        column("post_id", Integer), column("like", Boolean), name="reactions"
+    ).data(sorted(reactions.items()))
+    target = (
+        select(post.c.id, post.c.user_id, reaction_values.c.like)
+        .join_from(reaction_values, post, post.c.id == reaction_values.c.post_id)
+        .cte("target")
+    )
+    statement = insert(user_post).from_select(
+        ["user_id", "post_id", "like"],
+        select(literal(user_id), target.c.id, target.c.like).where(
+            target.c.user_id.is_distinct_from(user_id)
+        ),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[user_post.c.user_id, user_post.c.post_id],
+        set_={"like": statement.excluded.like},
+        where=user_post.c.like.is_distinct_from(statement.excluded.like),
+    )
+    upsert = statement.returning(
+        user_post.c.post_id,
+        user_post.c.like,
+        literal_column("xmax = 0").label("inserted"),
+    ).cte("upsert")
+    replaced = case((upsert.c.inserted, 0), else_=1)
+    counters = (
+        update(post)
+        .where(post.c.id == upsert.c.post_id)
+        .values(
+            version=post.c.version + 1,
+            likes_count=post.c.likes_count + case((upsert.c.like, 1), else_=-replaced),
+            dislikes_count=post.c.dislikes_count
+            + case((upsert.c.like, -replaced), else_=1),
+            **trend_values(
+                case(
+                    (
+                        upsert.c.like,
+                        TREND_LIKE_WEIGHT - replaced * TREND_DISLIKE_WEIGHT,
+                    ),
+                    else_=TREND_DISLIKE_WEIGHT - replaced * TREND_LIKE_WEIGHT,
+                )
+            ),
+        )
+        .returning(post.c.id)
+        .cte("counters")
+    )
+    result = await session.execute(
+        select(target.c.id, target.c.user_id.label("author_id"), upsert.c.inserted)
+        .select_from(target.outerjoin(upsert, upsert.c.post_id == target.c.id))
+        .add_cte(counters)
+    )
+    return {row.id: row for row in result.all()}
+
+
+async def delete_reactions(
+    post_ids: List[int], user_id: int, session: AsyncSession
+) -> Dict[int, bool]:
+    """
+    Deletes the reactions of the user on many posts in a single statement
+    without committing it. Returns the removed reactions by post id.
+    """
+    deleted = (
+        delete(user_post)
+        .where(user_post.c.user_id == user_id, user_post.c.post_id.in_(post_ids))
+        .returning(user_post.c.post_id, user_post.c.like)
+        .cte("deleted")
+    )
+    counters = (
+        update(post)
+        .where(post.c.id == deleted.c.post_id)
+        .values(
+            version=post.c.version + 1,
+            likes_count=post.c.likes_count - case((deleted.c.like, 1), else_=0),
+            dislikes_count=post.c.dislikes_count - case((deleted.c.like, 0), else_=1),
+            **trend_values(
+                -case((deleted.c.like, TREND_LIKE_WEIGHT), else_=TREND_DISLIKE_WEIGHT)
+            ),
+        )
+        .returning(post.c.id)
+        .cte("counters")
+    )
+    result = await session.execute(
+        select(deleted.c.post_id, deleted.c.like).add_cte(counters)
+    )
+    return {row.post_id: row.like for row in result.all()}
+
+
+@logger.catch
+async def apply_reactions_json(
+    operations: List[ReactionOperation], user_id: int, session: AsyncSession
+) -> dict:
+    """
+    Applies the reaction operations of the user in one transaction. Only the
+    last operation on a post is applied, the previous ones are superseded.
+    """
+    try:
+        if len(operations) > REACTIONS_BULK_MAX_SIZE:
+            return return_json(
+                status=STATUS[400],
+                message=f"Можно применить не более {REACTIONS_BULK_MAX_SIZE} реакций за раз",
+            )
+        last_operations = {
+            operation.post_id: index for index, operation in enumerate(operations)
+        }
+        reactions = {}
+        removals = []
+        for post_id, index in last_operations.items():
+            action = operations[index].action
+            if action == ReactionAction.remove:
+                removals.append(post_id)
+            else:
+                reactions[post_id] = action == ReactionAction.like
+        upserted = {}
+        if reactions:
+            upserted = await upsert_reactions(
+                reactions=reactions, user_id=user_id, session=session
+            )
+        removed = {}
+        if removals:
+            removed = await delete_reactions(
+                post_ids=removals, user_id=user_id, session=session
+            )
+        await session.commit()
+        for post_id, row in upserted.items():
+            if row.inserted is not None:
+                post_cache.invalidate(post_id)
+        for post_id in removed:
+            post_cache.invalidate(post_id)
+
+        data = []
+        for index, operation in enumerate(operations):
+            post_id = operation.post_id
+            if last_operations[post_id] != index:
+                result = "superseded"
+            elif operation.action == ReactionAction.remove:
+                result = "removed" if post_id in removed else "absent"
+            elif post_id not in upserted:
+                result = "not_found"
+            elif upserted[post_id].author_id == user_id:
+                result = "own_post"
+            elif upserted[post_id].inserted is None:
+                result = "unchanged"
+            else:
+                result = "created" if upserted[post_id].inserted else "changed"
+            data.append(
+                {
+                    "index": index,
+                    "post_id": post_id,
+                    "action": operation.action.value,
+                    "result": result,
+                }
+            )
+        return return_json(
+            status=STATUS[200],
+            message=f"Пользователь #{user_id} применил реакции на посты",
+            data=data,
+        )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при применении реакций пользователем #{user_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def get_all_user_post_by_post_id(
+    post_id: int, session: AsyncSession
+) -> Optional[List[UserPost]]:
+    try:
+        existing_user_post = await session.execute(
+            select(user_post).filter_by(post_id=post_id)
+        )
+        data = existing_user_post.all()
+        gotten_user_post = []
+        for row in data:
+            gotten_user_post.append(
+                UserPost(
+                    user_id=row.user_id,
+                    post_id=row.post_id,
+                    like=row.like,
+                )
+            )
+        return gotten_user_post
+    except Exception as e:
+        logger.error(str(e))
+        return None
+
+
+@logger.catch
+async def get_likes_by_post_id_json(
+    post_id: int,
+    session: AsyncSession,
+) -> dict:
+    try:
+        result = await session.execute(
+            select(post.c.likes_count, post.c.dislikes_count).where(
+                post.c.id == post_id
+            )
+        )
+        counters = result.one_or_none()
+        if counters is not None:
+            data = [
+                {
+                    "total_reactions": counters.likes_count + counters.dislikes_count,
+                    "likes": counters.likes_count,
+                    "dislikes": counters.dislikes_count,
+                }
+            ]
+            return return_json(
+                status=STATUS[200],
+                message=f"Успешно получены реакции на пост #{post_id}",
+                data=data,
+            )
+        else:
+            return return_json(
+                status=STATUS[400],
+                message=f"Пост #{post_id} не найден",
+            )
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message=f"Произошла ошибка при попытке получить реакции на пост #{post_id}",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def get_likes_by_post_ids_json(
+    post_ids: List[int],
+    session: AsyncSession,
+) -> dict:
+    try:
+        post_ids = list(dict.fromkeys(post_ids))
+        if len(post_ids) > FEED_BATCH_MAX_SIZE:
+            return return_json(
+                status=STATUS[400],
+                message=f"Можно запросить реакции не более чем на {FEED_BATCH_MAX_SIZE} постов",
+            )
+        result = await session.execute(
+            select(post.c.id, post.c.likes_count, post.c.dislikes_count).where(
+                post.c.id.in_(post_ids)
+            )
+        )
+        counters = {row.id: row for row in result.all()}
+        data = []
+        missing_post_ids = []
+        for post_id in post_ids:
+            row = counters.get(post_id)
+            if row is not None:
+                data.append(
+                    {
+                        "post_id": post_id,
+                        "total_reactions": row.likes_count + row.dislikes_count,
+                        "likes": row.likes_count,
+                        "dislikes": row.dislikes_count,
+                    }
+                )
+            else:
+                missing_post_ids.append(post_id)
+                data.append(
+                    {
+                        "post_id": post_id,
+                        "total_reactions": None,
+                        "likes": None,
+                        "dislikes": None,
+                    }
+                )
+        if missing_post_ids:
+            missing = ", ".join(f"#{post_id}" for post_id in missing_post_ids)
+            message = f"Получены реакции на посты, не найдены посты {missing}"
+        else:
+            message = "Успешно получены реакции на посты"
+        return return_json(status=STATUS[200], message=message, data=data)
+    except Exception as e:
+        logger.error(str(e))
+        return return_json(
+            status=STATUS[400],
+            message="Произошла ошибка при попытке получить реакции на посты",
+            details=str(e),
+        )
+
+
+@logger.catch
+async def reconcile_reaction_counters(
+    session: AsyncSession, post_ids: Optional[List[int]] = None
+) -> int:
+    """
+    Recomputes likes_count and dislikes_count from user_post for the posts
+    whose counters have drifted. Returns the number of repaired posts.
+    """
+    likes = (
+        select(func.count())
+        .where(user_post.c.post_id == post.c.id, user_post.c.like)
+        .scalar_subquery()
+    )
+    dislikes = (
+        select(func.count())
+        .where(user_post.c.post_id == post.c.id, not_(user_post.c.like))
+        .scalar_subquery()
+    )
+    statement = (
+        update(post)
+        .where(or_(post.c.likes_count != likes, post.c.dislikes_count != dislikes))
+        .values(likes_count=likes, dislikes_count=dislikes, version=post.c.version + 1)
+    )
+    if post_ids is not None:
+        statement = statement.where(post.c.id.in_(post_ids))
+    result = await session.execute(statement.returning(post.c.id))
+    repaired = result.scalars().all()
+    await session.commit()
+    for post_id in repaired:
+        post_cache.invalidate(post_id)
+    return len(repaired)
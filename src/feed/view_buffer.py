@@ -0,0 +1,118 @@
+import asyncio
+from contextlib import suppress
+from typing import Dict, Optional
+
+from sqlalchemy import Integer, column, func, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import TREND_VIEW_WEIGHT, VIEW_FLUSH_INTERVAL, VIEW_FLUSH_MAX_PENDING
+from src.database import async_session_maker
+from src.feed.cache import post_cache
+from src.feed.models import post
+from src.feed.trending import trend_values
+from src.utils import logger
+
+
+class ViewCounterBuffer:
+    """
+    Collects post views in memory and writes them to the database in batches.
+
+    Views are merged per post id and written with one
+    UPDATE ... FROM (VALUES ...) statement, which also adds the views to the
+    trend scores, every flush_interval seconds or as soon as max_pending
+    posts are waiting. With flush_interval <= 0 every view is written
+    immediately.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = VIEW_FLUSH_INTERVAL,
+        max_pending: int = VIEW_FLUSH_MAX_PENDING,
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[int, int] = {}
+        self._flush_needed = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, post_id: int, count: int = 1) -> None:
+        self._pending[post_id] = self._pending.get(post_id, 0) + count
+        if len(self._pending) >= self.max_pending:
+            self._flush_needed.set()
+
+    def pending(self, post_id: int) -> int:
+        return self._pending.get(post_id, 0)
+
+    async def record(self, post_id: int, session: AsyncSession) -> None:
+        self.add(post_id=post_id)
+        if self.flush_interval <= 0:
+            await self.flush(session=session)
+
+    async def flush(self, session: Optional[AsyncSession] = None) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            if session is None:
+                async with async_session_maker() as session:
+                    await self._write(pending=pending, session=session)
+            else:
+                await self._write(pending=pending, session=session)
+            return len(pending)
+        except Exception as e:
+            logger.error(str(e))
+            self._restore(pending=pending)
+            return 0
+        except BaseException:
+            self._restore(pending=pending)
+            raise
+
+    def _restore(self, pending: Dict[int, int]) -> None:
+        for post_id, count in pending.items():
+            self._pending[post_id] = self._pending.get(post_id, 0) + count
+
+    @staticmethod
+    async def _write(pending: Dict[int, int], session: AsyncSession) -> None:
+        increments = values(
+            column("id", Integer), column("count", Integer), name="increments"
+        ).data(sorted(pending.items()))
+        statement = (
+            update(post)
+            .where(post.c.id == increments.c.id)
+            .values(
+                views=func.coalesce(post.c.views, 0) + increments.c.count,
+                version=post.c.version + 1,
+                **trend_values(increments.c.count * TREND_VIEW_WEIGHT),
+            )
+        )
+        await session.execute(statement)
+        await session.commit()
+        for post_id in pending:
+            post_cache.invalidate(post_id)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._flush_needed.wait(), timeout=self.flush_interval
+                )
+            self._flush_needed.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self.flush_interval > 0 and self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # let the loop finish its current flush instead of cancelling it
+            self._stopping.set()
+            self._flush_needed.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+view_buffer = ViewCounterBuffer()
@@ -1,19 +1,81 @@
-from fastapi import FastAPI
-
-from src.auth.base_config import auth_backend, fastapi_users
-from src.auth.schemas import UserCreate, UserRead
-from src.feed.router import router as feed_router
-
-app = FastAPI(title="SocialNetwork App")
-
-app.include_router(
-    fastapi_users.get_auth_router(auth_backend),
-    prefix="/auth/jwt",
-    tags=["auth"],
-)
-app.include_router(
-    fastapi_users.get_register_router(UserRead, UserCreate),
-    prefix="/auth",
-    tags=["auth"],
-)
-app.include_router(feed_router, prefix="/feed", tags=["feed"])
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from src.auth.base_config import auth_backend, fastapi_users
+from src.auth.cache import user_cache
+from src.auth.password import password_helper
+from src.auth.schemas import UserCreate, UserRead
+from src.database import (
+    ReadAfterWriteMiddleware,
+    dispose_engine,
+    engine,
+    get_pool_stats,
+    replica_router,
+    warm_up_pool,
+)
+from src.feed.cache import post_cache
+from src.feed.router import router as feed_router
+from src.feed.view_buffer import view_buffer
+from src.metrics import MetricsMiddleware, instrument_engine, registry
+from src.utils import STATUS, logger, return_json
+
+app = FastAPI(title="SocialNetwork App")
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+for number, replica in enumerate(replica_router.engines, start=1):
+    instrument_engine(replica, name=f"replica{number}")
+if replica_router.engines:
+    app.add_middleware(ReadAfterWriteMiddleware)
+
+app.include_router(
+    fastapi_users.get_auth_router(auth_backend),
+    prefix="/auth/jwt",
+    tags=["auth"],
+)
+app.include_router(
+    fastapi_users.get_register_router(UserRead, UserCreate),
+    prefix="/auth",
+    tags=["auth"],
+)
+app.include_router(feed_router, prefix="/feed", tags=["feed"])
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    await warm_up_pool()
+    for replica in replica_router.engines:
+        await warm_up_pool(engine_=replica)
+    view_buffer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await view_buffer.stop()
+    await dispose_engine()
+    for replica in replica_router.engines:
+        await dispose_engine(replica)
+    # waiting for the running hashes would block the event loop
+    password_helper.executor.shutdown(wait=False)
+    await logger.complete()
+
+
+@app.get("/pool_stats", tags=["service"])
+async def pool_stats() -> dict:
+    return return_json(
+        status=STATUS[200],
+        data=[get_pool_stats()]
+        + [get_pool_stats(replica) for replica in replica_router.engines],
+    )
+
+
+@app.get("/cache_stats", tags=["service"])
+async def cache_stats() -> dict:
+    return return_json(
+        status=STATUS[200],
+        data=[{"post": post_cache.stats(), "user": user_cache.stats()}],
+    )
+
+
+@app.get("/metrics", tags=["service"])
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
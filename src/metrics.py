@@ -0,0 +1,283 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.database import get_pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labelnames: Tuple[str, ...], labels: Tuple[str, ...]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label(value)}"' for name, value in zip(labelnames, labels)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter with a value for every combination of labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value: float, *labels: str) -> None:
+        """Sets a value collected from another monotonic source."""
+        self._values[labels] = value
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets for every combination of labels.
+
+    observe() only increments one bucket, cumulative counts are computed
+    when the metrics are rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [counts of the buckets and +Inf, sum]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        item = self._values.get(labels)
+        if item is None:
+            item = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = item
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, *labels: str) -> int:
+        item = self._values.get(labels)
+        return sum(item[0]) if item is not None else 0
+
+    def sum(self, *labels: str) -> float:
+        item = self._values.get(labels)
+        return item[1][0] if item is not None else 0.0
+
+    def samples(self) -> List[str]:
+        samples = []
+        labelnames = self.labelnames + ("le",)
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bucket, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = format_labels(labelnames, labels + (str(bucket),))
+                samples.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = format_labels(self.labelnames, labels)
+            samples.append(f"{self.name}_sum{labels} {total[0]}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+class Gauge(Counter):
+    """Value that is set when the metrics are rendered."""
+
+    type = "gauge"
+
+
+class MetricsRegistry:
+    """Renders the registered metrics in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route template and status code.",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Latency of HTTP requests by route template.",
+        ("method", "route"),
+    )
+)
+db_queries_per_request = registry.register(
+    Histogram(
+        "db_queries_per_request",
+        "Database queries executed by one HTTP request.",
+        ("route",),
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+)
+db_query_time_per_request = registry.register(
+    Histogram(
+        "db_query_seconds_per_request",
+        "Time spent in database queries by one HTTP request.",
+        ("route",),
+    )
+)
+db_query_duration = registry.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "Latency of single database queries.",
+        buckets=QUERY_BUCKETS,
+    )
+)
+db_pool_waits = registry.register(
+    Counter("db_pool_waits_total", "Checkouts of connections from the pool.", ("pool",))
+)
+db_pool_wait_time = registry.register(
+    Counter(
+        "db_pool_wait_seconds_total",
+        "Time spent waiting for connections from the pool.",
+        ("pool",),
+    )
+)
+db_pool_connections = registry.register(
+    Gauge(
+        "db_pool_connections",
+        "Connections of the pool by state.",
+        ("pool", "state"),
+    )
+)
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# queries of the HTTP request handled by the current task
+current_queries: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_queries", default=None
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    db_query_duration.observe(elapsed)
+    queries = current_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += elapsed
+
+
+def handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+
+def instrument_engine(engine_: AsyncEngine, name: str = "primary") -> None:
+    """Times the queries of the engine and exposes the stats of its pool."""
+    event.listen(engine_.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine_.sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine_.sync_engine, "handle_error", handle_error)
+
+    def collect_pool_stats() -> None:
+        stats = get_pool_stats(engine_)
+        if "wait_count" not in stats:
+            return
+        db_pool_waits.set(stats["wait_count"], name)
+        db_pool_wait_time.set(stats["wait_time_total"], name)
+        for state in ("checked_in", "checked_out", "overflow"):
+            db_pool_connections.set(stats[state], name, state)
+
+    registry.collectors.append(collect_pool_stats)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware which records the latency, the status code and the
+    database queries of every HTTP request by its route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = QueryStats()
+        token = current_queries.set(queries)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            current_queries.reset(token)
+            route = scope.get("route")
+            template = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, template, str(status))
+            http_request_duration.observe(elapsed, method, template)
+            db_queries_per_request.observe(queries.count, template)
+            db_query_time_per_request.observe(queries.seconds, template)
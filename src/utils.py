@@ -1,23 +1,122 @@
-from loguru import logger
-
-STATUS = {200: "success", 400: "error"}
-
-
-def return_json(
-    status: STATUS, message: str = None, data: list = None, details: str = None
-) -> dict:
-    return {
-        "status": status,
-        "message": message,
-        "data": data,
-        "details": details,
-    }
-
-
-logger.add(
-    "../app.log",
-    format="{time}\t|\t{level}\t|\t{message}",
-    level="INFO",
-    rotation="10MB",
-    compression="zip",
-)
+import random
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from loguru import logger
+
+from src.config import (
+    LOG_ERROR_RATE_LIMIT,
+    LOG_ERROR_RATE_WINDOW,
+    LOG_FILE,
+    LOG_JSON,
+    LOG_LEVEL,
+    LOG_SAMPLE_RATES,
+)
+
+STATUS = {200: "success", 400: "error"}
+
+
+def return_json(
+    status: STATUS,
+    message: str = None,
+    data: list = None,
+    details: str = None,
+    next_cursor: str = None,
+) -> dict:
+    return {
+        "status": status,
+        "message": message,
+        "data": data,
+        "details": details,
+        "next_cursor": next_cursor,
+    }
+
+
+class LogFilter:
+    """
+    Filter of a log sink.
+
+    Keeps the given share of the records of every level (all of them by
+    default) and lets through at most error_rate_limit records of the ERROR
+    level and above with the same message per error_rate_window seconds.
+    The first record after a window gets the number of dropped repeats in
+    extra["dropped_repeats"], log_format appends it to the message.
+    """
+
+    max_messages = 10000
+
+    def __init__(
+        self,
+        sample_rates: Dict[str, float] = None,
+        error_rate_limit: int = LOG_ERROR_RATE_LIMIT,
+        error_rate_window: float = LOG_ERROR_RATE_WINDOW,
+    ):
+        self.sample_rates = sample_rates or {}
+        self.error_rate_limit = error_rate_limit
+        self.error_rate_window = error_rate_window
+        self.error_level = logger.level("ERROR").no
+        # message -> [window start, records in the window, dropped records]
+        self._errors: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict) -> bool:
+        rate = self.sample_rates.get(record["level"].name)
+        if rate is not None and random.random() >= rate:
+            return False
+        if self.error_rate_limit <= 0 or record["level"].no < self.error_level:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            window = self._errors.get(record["message"])
+            if window is None or now - window[0] >= self.error_rate_window:
+                if window is None and len(self._errors) >= self.max_messages:
+                    self._prune(now)
+                self._errors[record["message"]] = [now, 1, 0]
+                # the record is shared by all sinks, so its message stays as is
+                if window is not None and window[2]:
+                    record["extra"]["dropped_repeats"] = window[2]
+                return True
+            if window[1] < self.error_rate_limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+    def _prune(self, now: float) -> None:
+        self._errors = {
+            message: window
+            for message, window in self._errors.items()
+            if now - window[0] < self.error_rate_window
+        }
+        if len(self._errors) >= self.max_messages:
+            self._errors.clear()
+
+
+def log_format(record: dict) -> str:
+    dropped_repeats = record["extra"].get("dropped_repeats")
+    suffix = f" (повторов пропущено: {dropped_repeats})" if dropped_repeats else ""
+    return "{time}\t|\t{level}\t|\t{message}" + suffix + "\n{exception}"
+
+
+# the default stderr sink writes on the calling thread and has no filter
+logger.remove()
+logger.add(
+    sys.stderr,
+    format=log_format,
+    level=LOG_LEVEL,
+    enqueue=True,
+    filter=LogFilter(sample_rates=LOG_SAMPLE_RATES),
+)
+logger.add(
+    LOG_FILE,
+    format=log_format,
+    level=LOG_LEVEL,
+    rotation="10MB",
+    compression="zip",
+    enqueue=True,
+    serialize=LOG_JSON,
+    filter=LogFilter(sample_rates=LOG_SAMPLE_RATES),
+)
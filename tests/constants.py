@@ -1,7 +1,13 @@
-EMAIL = "softbananas.inc@mail.ru"
-PASSWD = "softbananas.inc"
-USERNAME = "Внуков Иван"
-
-EMAIL_2 = "softbananas@mail.ru"
-PASSWD_2 = "softbananas"
-USERNAME_2 = "Не Внуков Иван"
+EMAIL = "softbananas.inc@mail.ru"
+PASSWD = "softbananas.inc"
+USERNAME = "Внуков Иван"
+
+EMAIL_2 = "softbananas@mail.ru"
+PASSWD_2 = "softbananas"
+USERNAME_2 = "Не Внуков Иван"
+
+EMAIL_3 = "softbananas.follower@mail.ru"
+USERNAME_3 = "Подписчик Ивана"
+
+PLANS_EMAIL = "plans.author@mail.ru"
+PLANS_EMAIL_2 = "plans.reader@mail.ru"
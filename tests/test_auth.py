@@ -1,23 +1,52 @@
-from httpx import AsyncClient
-
-from tests.constants import EMAIL, PASSWD, USERNAME
-from tests.utils import delete_all_users, delete_user, get_user, register
-
-# from tests.conftest import async_session_maker
-
-# async def test_delete_all_users():
-#     await delete_all_users()
-#     assert len(await get_all_users()) == 0
-
-
-async def test_register(ac: AsyncClient):
-    # await delete_all_users()
-    assert len(await get_user(EMAIL)) == 0
-    response = await register(ac=ac, email=EMAIL, username=USERNAME, password=PASSWD)
-    assert response.status_code == 201
-    assert len(await get_user(EMAIL)) == 1
-
-
-async def test_delete_user():
-    await delete_user(EMAIL)
-    assert len(await get_user(EMAIL)) == 0
+import threading
+
+from fastapi_users.password import PasswordHelper
+from httpx import AsyncClient
+
+from tests.constants import EMAIL, PASSWD, USERNAME
+from tests.utils import delete_all_users, delete_user, get_user, login, register
+
+# from tests.conftest import async_session_maker
+
+# async def test_delete_all_users():
+#     await delete_all_users()
+#     assert len(await get_all_users()) == 0
+
+
+async def test_register(ac: AsyncClient):
+    # await delete_all_users()
+    assert len(await get_user(EMAIL)) == 0
+    response = await register(ac=ac, email=EMAIL, username=USERNAME, password=PASSWD)
+    assert response.status_code == 201
+    assert len(await get_user(EMAIL)) == 1
+
+
+async def test_login_does_not_block_event_loop(ac: AsyncClient, monkeypatch):
+    threads = []
+
+    def record_thread(function):
+        def wrapper(*args):
+            threads.append(threading.current_thread())
+            return function(*args)
+
+        return wrapper
+
+    for name in ("hash", "verify_and_update"):
+        monkeypatch.setattr(
+            PasswordHelper, name, record_thread(getattr(PasswordHelper, name))
+        )
+    response = await login(ac=ac, email=EMAIL, password=PASSWD)
+    assert response.status_code == 204
+    # an unknown user gets the password hashed anyway
+    response = await login(ac=ac, email=f"unknown.{EMAIL}", password=PASSWD)
+    assert response.status_code == 400
+
+    assert len(threads) == 2
+    for thread in threads:
+        assert thread is not threading.main_thread()
+        assert thread.name.startswith("password")
+
+
+async def test_delete_user():
+    await delete_user(EMAIL)
+    assert len(await get_user(EMAIL)) == 0
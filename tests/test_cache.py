@@ -0,0 +1,47 @@
+import time
+
+from src.cache import TTLCache
+
+
+def test_get_and_set():
+    cache = TTLCache(max_size=2, ttl=60)
+    assert cache.get(1) is None
+    cache.set(1, "first")
+    assert cache.get(1) == "first"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set(1, "first")
+    cache.set(2, "second")
+    cache.get(1)
+    cache.set(3, "third")
+    assert cache.get(2) is None
+    assert cache.get(1) == "first"
+    assert cache.get(3) == "third"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expiration():
+    cache = TTLCache(max_size=2, ttl=0.01)
+    cache.set(1, "first")
+    time.sleep(0.02)
+    assert cache.get(1) is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set(1, "first")
+    cache.invalidate(1)
+    cache.invalidate(2)
+    assert cache.get(1) is None
+
+
+def test_disabled_cache():
+    cache = TTLCache(max_size=0, ttl=60)
+    cache.set(1, "first")
+    assert cache.get(1) is None
@@ -0,0 +1,174 @@
+import os
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, func, insert, select
+
+from src.database import (
+    DATABASE_URL,
+    READ_PRIMARY_COOKIE,
+    ReadAfterWriteMiddleware,
+    ReplicaRouter,
+    async_session_maker,
+    build_engine,
+    dispose_engine,
+    engine,
+    get_pool_stats,
+    is_replica_session,
+    reads_from_primary,
+    warm_up_pool,
+)
+from src.feed.cache import post_cache
+from src.feed.models import post
+from src.feed.utils import get_post_by_id, get_post_by_post_id_json
+from src.main import app
+from src.utils import STATUS
+
+# a second database with the schema of the primary which plays the replica
+REPLICA_URL = os.environ.get("DB_REPLICA_TEST_URL")
+
+
+async def test_null_pool_stats():
+    engine = build_engine(DATABASE_URL, pool_class="null")
+    assert get_pool_stats(engine) == {"pool_class": "NullPool"}
+    await dispose_engine(engine)
+
+
+async def test_warm_up_pool():
+    engine = build_engine(DATABASE_URL, pool_class="queue")
+    await warm_up_pool(connections=2, engine_=engine)
+
+    stats = get_pool_stats(engine)
+    assert stats["checked_in"] == 2
+    assert stats["checked_out"] == 0
+    assert stats["wait_count"] == 2
+
+    async with engine.connect():
+        assert get_pool_stats(engine)["checked_out"] == 1
+
+    await dispose_engine(engine)
+    assert get_pool_stats(engine)["checked_in"] == 0
+
+
+async def test_replica_round_robin():
+    engines = [build_engine(DATABASE_URL, pool_class="null") for _ in range(3)]
+    router = ReplicaRouter(engines, selection="round_robin")
+    assert [router.choose() for _ in range(4)] == [0, 1, 2, 0]
+
+
+async def test_replica_least_busy():
+    engines = [build_engine(DATABASE_URL, pool_class="null") for _ in range(2)]
+    router = ReplicaRouter(engines, selection="least_busy")
+    async with router.session():
+        async with router.session():
+            assert router.in_use == [1, 1]
+        assert router.in_use == [1, 0]
+        async with router.session():
+            assert router.in_use == [1, 1]
+    assert router.in_use == [0, 0]
+
+    with pytest.raises(ValueError):
+        ReplicaRouter(engines, selection="random")
+
+
+async def test_read_after_write_cookie():
+    async with AsyncClient(
+        app=ReadAfterWriteMiddleware(app, window=5), base_url="http://test"
+    ) as client:
+        response = await client.get("feed/get_reactions/0")
+        assert READ_PRIMARY_COOKIE not in response.cookies
+        response = await client.put("feed/view_post/0")
+        assert reads_from_primary(response.cookies)
+    assert not reads_from_primary({READ_PRIMARY_COOKIE: "0"})
+    assert not reads_from_primary({READ_PRIMARY_COOKIE: "wrong"})
+
+
+async def test_replica_session_does_not_fill_post_cache():
+    async with engine.begin() as connection:
+        post_id = await connection.scalar(
+            insert(post).values(title="Пост", text="Текст").returning(post.c.id)
+        )
+    # the primary database plays the replica
+    router = ReplicaRouter([build_engine(DATABASE_URL, pool_class="null")])
+    post_cache.invalidate(post_id)
+    try:
+        async with router.session() as session:
+            assert is_replica_session(session)
+            assert (
+                await get_post_by_id(post_id=post_id, session=session)
+            ).id == post_id
+        assert post_cache.get(post_id) is None
+
+        async with async_session_maker() as session:
+            assert not is_replica_session(session)
+            await get_post_by_id(post_id=post_id, session=session)
+        assert post_cache.get(post_id)["id"] == post_id
+    finally:
+        post_cache.invalidate(post_id)
+        async with engine.begin() as connection:
+            await connection.execute(delete(post).where(post.c.id == post_id))
+        await dispose_engine(router.engines[0])
+
+
+@pytest.mark.skipif(
+    REPLICA_URL is None, reason="DB_REPLICA_TEST_URL of a second database is not set"
+)
+async def test_stale_replica_does_not_fill_post_cache(monkeypatch):
+    replica = build_engine(REPLICA_URL, pool_class="null")
+    async with engine.begin() as connection:
+        post_id = await connection.scalar(
+            insert(post)
+            .values(title="Новый заголовок", text="Текст")
+            .returning(post.c.id)
+        )
+    async with replica.begin() as connection:
+        await connection.execute(
+            insert(post).values(id=post_id, title="Старый заголовок", text="Текст")
+        )
+    monkeypatch.setattr("src.database.replica_router", ReplicaRouter([replica]))
+    post_cache.invalidate(post_id)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get(f"feed/get_post/{post_id}")
+            assert response.json()["data"][0]["title"] == "Старый заголовок"
+
+        async with async_session_maker() as session:
+            response = await get_post_by_post_id_json(post_id=post_id, session=session)
+        assert response["data"][0]["title"] == "Новый заголовок"
+    finally:
+        post_cache.invalidate(post_id)
+        for engine_ in (engine, replica):
+            async with engine_.begin() as connection:
+                await connection.execute(delete(post).where(post.c.id == post_id))
+        await dispose_engine(replica)
+
+
+@pytest.mark.skipif(
+    REPLICA_URL is None, reason="DB_REPLICA_TEST_URL of a second database is not set"
+)
+async def test_reads_from_replica(monkeypatch):
+    replica = build_engine(REPLICA_URL, pool_class="null")
+    async with engine.begin() as connection:
+        post_id = await connection.scalar(select(func.max(post.c.id)))
+    post_id = (post_id or 0) + 1000000
+    async with replica.begin() as connection:
+        await connection.execute(
+            insert(post).values(id=post_id, title="Пост реплики", likes_count=7)
+        )
+    monkeypatch.setattr("src.database.replica_router", ReplicaRouter([replica]))
+    try:
+        async with AsyncClient(
+            app=ReadAfterWriteMiddleware(app, window=5), base_url="http://test"
+        ) as client:
+            response = await client.get(f"feed/get_reactions/{post_id}")
+            assert response.json()["data"][0]["likes"] == 7
+
+            response = await client.put(f"feed/view_post/{post_id}")
+            response = await client.get(
+                f"feed/get_reactions/{post_id}", cookies=response.cookies
+            )
+            assert response.json()["status"] == STATUS[400]
+    finally:
+        async with replica.begin() as connection:
+            await connection.execute(delete(post).where(post.c.id == post_id))
+        await dispose_engine(replica)
@@ -1,678 +1,1752 @@
-from httpx import AsyncClient
-
-from src.database import async_session_maker
-from src.feed.schemas import PostCreate, PostUpdate
-from src.feed.utils import (
-    create_post_json,
-    delete_post_json,
-    dislike_post_json,
-    edit_post_json,
-    get_likes_by_post_id_json,
-    get_posts_by_user_id_json,
-    like_post_json,
-    remove_the_reaction_json,
-    view_post_json,
-)
-from src.utils import STATUS, return_json
-from tests.constants import EMAIL, EMAIL_2, PASSWD, PASSWD_2, USERNAME, USERNAME_2
-from tests.utils import delete_user, get_user, register
-
-
-async def test_create_post(ac: AsyncClient):
-    if len(await get_user(EMAIL)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL, username=USERNAME, password=PASSWD
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL)) == 1
-
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    post_to_create = PostCreate(title="Тестовый пост", text="Текст для тестового поста")
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} успешно опубликовал пост",
-    )
-    async with async_session_maker() as session:
-        response = await create_post_json(
-            post_to_create=post_to_create, user_id=user_id, session=session
-        )
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_right_edit_post(ac: AsyncClient):
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    assert isinstance(post_id, int)
-
-    post_update = PostUpdate(id=post_id, title="Новый загаловок", text="Новый текст")
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пост #{post_id} успешно изменён пользователем #{user_id}",
-    )
-
-    async with async_session_maker() as session:
-        response = await edit_post_json(
-            post_update=post_update, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_edit_post_with_wrong_user(ac: AsyncClient):
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    assert isinstance(post_id, int)
-
-    post_update = PostUpdate(id=post_id, title="Новый загаловок", text="Новый текст")
-
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    wrong_user = await get_user(email=EMAIL_2)
-    wrong_user_id = wrong_user[0][0].id
-
-    right_response = return_json(
-        status=STATUS[400],
-        message=f"Пользователь #{wrong_user_id} не имеет права изменять пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        response = await edit_post_json(
-            post_update=post_update, user_id=wrong_user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_edit_post_with_wrong_post(ac: AsyncClient):
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    assert isinstance(post_id, int)
-
-    wrong_post_id = post_id + 1
-
-    post_update = PostUpdate(
-        id=wrong_post_id, title="Новый загаловок", text="Новый текст"
-    )
-
-    right_response = return_json(
-        status=STATUS[400],
-        message=f"Пост #{wrong_post_id} не существует",
-    )
-
-    async with async_session_maker() as session:
-        response = await edit_post_json(
-            post_update=post_update, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_view_post():
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пост #{post_id} успешно просмотрем пользователем #{user_id}",
-    )
-
-    async with async_session_maker() as session:
-        response = await view_post_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_view_post_with_wrong_post():
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    wrong_post_id = posts["data"][-1]["id"] + 1
-
-    right_response = return_json(
-        status=STATUS[400],
-        message=f"Пост #{wrong_post_id} не существует",
-    )
-
-    async with async_session_maker() as session:
-        response = await view_post_json(
-            post_id=wrong_post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_like_post_by_author(ac: AsyncClient):
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[400],
-        message=f"Пользователь #{auth_id} попытался поставить реакцию на свой пост #{post_id} ",
-    )
-
-    async with async_session_maker() as session:
-        response = await like_post_json(
-            post_id=post_id, user_id=auth_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_like_post(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} успешно поставил лайк на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await remove_the_reaction_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-        response = await like_post_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 1,
-        "likes": 1,
-        "dislikes": 0,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_double_like_post(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} уже ставил лайк на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await like_post_json(post_id=post_id, user_id=user_id, session=session)
-        response = await like_post_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 1,
-        "likes": 1,
-        "dislikes": 0,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_change_dislike_to_like_post(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} убрал дизлайк и поставил лайк на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await dislike_post_json(post_id=post_id, user_id=user_id, session=session)
-        response = await like_post_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 1,
-        "likes": 1,
-        "dislikes": 0,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_dislike_post_by_author(ac: AsyncClient):
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[400],
-        message=f"Пользователь #{auth_id} попытался поставить реакцию на свой пост #{post_id} ",
-    )
-
-    async with async_session_maker() as session:
-        response = await dislike_post_json(
-            post_id=post_id, user_id=auth_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_dislike_post(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} успешно поставил дизлайк на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await remove_the_reaction_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-        response = await dislike_post_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 1,
-        "likes": 0,
-        "dislikes": 1,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_double_dislike_post(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} уже ставил дизлайк на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await dislike_post_json(post_id=post_id, user_id=user_id, session=session)
-        response = await dislike_post_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 1,
-        "likes": 0,
-        "dislikes": 1,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_change_like_to_dislike_post(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} убрал лайк и поставил дизлайк на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await like_post_json(post_id=post_id, user_id=user_id, session=session)
-        response = await dislike_post_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 1,
-        "likes": 0,
-        "dislikes": 1,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_remove_the_reaction(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[200],
-        message=f"Пользователь #{user_id} убрал реакцию на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await like_post_json(post_id=post_id, user_id=user_id, session=session)
-        response = await remove_the_reaction_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    async with async_session_maker() as session:
-        await dislike_post_json(post_id=post_id, user_id=user_id, session=session)
-        response = await remove_the_reaction_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 0,
-        "likes": 0,
-        "dislikes": 0,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_double_remove_the_reaction(ac: AsyncClient):
-    if len(await get_user(EMAIL_2)) == 0:
-        response = await register(
-            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
-        )
-        assert response.status_code == 201
-    assert len(await get_user(EMAIL_2)) == 1
-    user = await get_user(email=EMAIL_2)
-    user_id = user[0][0].id
-
-    auth = await get_user(email=EMAIL)
-    auth_id = auth[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
-    post_id = posts["data"][-1]["id"]
-
-    right_response = return_json(
-        status=STATUS[400],
-        message=f"Пользователь #{user_id} ещё не ставил реакцию на пост #{post_id}",
-    )
-
-    async with async_session_maker() as session:
-        await remove_the_reaction_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-        response = await remove_the_reaction_json(
-            post_id=post_id, user_id=user_id, session=session
-        )
-
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-    right_get_likes_data = {
-        "total_reactions": 0,
-        "likes": 0,
-        "dislikes": 0,
-    }
-    async with async_session_maker() as session:
-        get_likes_json = await get_likes_by_post_id_json(
-            post_id=post_id, session=session
-        )
-        get_likes_data = get_likes_json["data"][0]
-
-    for key, value in right_get_likes_data.items():
-        assert value == get_likes_data[key] or value is get_likes_data[key]
-
-
-async def test_delete_post_with_wrong_user():
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    posts_data = posts["data"]
-
-    wrong_user_id = user_id + 1
-
-    for data in posts_data:
-        post_id = data["id"]
-        right_response = return_json(
-            status=STATUS[400],
-            message=f"Пользователь #{wrong_user_id} не имеет права удалять пост #{post_id}",
-        )
-        async with async_session_maker() as session:
-            response = await delete_post_json(
-                post_id=post_id, user_id=wrong_user_id, session=session
-            )
-        for key, value in right_response.items():
-            assert value == response[key] or value is response[key]
-
-
-async def test_delete_post_with_wrong_post():
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    wrong_post_id = posts["data"][-1]["id"] + 1
-
-    right_response = return_json(
-        status=STATUS[400],
-        message=f"Пост #{wrong_post_id} не существует",
-    )
-    async with async_session_maker() as session:
-        response = await delete_post_json(
-            post_id=wrong_post_id, user_id=user_id, session=session
-        )
-    for key, value in right_response.items():
-        assert value == response[key] or value is response[key]
-
-
-async def test_delete_post():
-    user = await get_user(email=EMAIL)
-    user_id = user[0][0].id
-
-    async with async_session_maker() as session:
-        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
-    posts_data = posts["data"]
-
-    for data in posts_data:
-        post_id = data["id"]
-        right_response = return_json(
-            status=STATUS[200],
-            message=f"Пост #{post_id} успешно удален",
-        )
-        async with async_session_maker() as session:
-            response = await delete_post_json(
-                post_id=post_id, user_id=user_id, session=session
-            )
-        for key, value in right_response.items():
-            assert value == response[key] or value is response[key]
-
-
-async def test_delete_user():
-    await delete_user(EMAIL)
-    assert len(await get_user(EMAIL)) == 0
-    await delete_user(EMAIL_2)
-    assert len(await get_user(EMAIL_2)) == 0
+import asyncio
+import json
+
+import fastapi.routing
+import pytest
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from httpx import AsyncClient
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.base_config import get_jwt_strategy
+from src.auth.cache import user_cache
+from src.auth.manager import UserManager
+from src.auth.models import User
+from src.auth.schemas import UserUpdate
+from src.config import TREND_DISLIKE_WEIGHT, TREND_LIKE_WEIGHT, TREND_VIEW_WEIGHT
+from src.database import async_session_maker, engine
+from src.feed.cache import post_cache
+from src.feed.models import post, timeline
+from src.feed.schemas import PostCreate, PostUpdate, ReactionOperation
+from src.feed.trending import trending_posts
+from src.feed.utils import (
+    apply_reactions_json,
+    create_post_json,
+    create_posts_json,
+    delete_post_json,
+    delete_posts_json,
+    dislike_post_json,
+    edit_post_json,
+    encode_cursor,
+    export_posts_ndjson,
+    follow_user_json,
+    get_all_user_post_by_post_id,
+    get_home_feed_json,
+    get_likes_by_post_id_json,
+    get_likes_by_post_ids_json,
+    get_post_by_post_id_json,
+    get_posts_by_user_id_json,
+    get_trending_posts_json,
+    like_post_json,
+    reconcile_reaction_counters,
+    remove_the_reaction_json,
+    search_posts_json,
+    unfollow_user_json,
+    view_post_json,
+)
+from src.feed.view_buffer import ViewCounterBuffer
+from src.main import app
+from src.utils import STATUS, return_json
+from tests.constants import (
+    EMAIL,
+    EMAIL_2,
+    EMAIL_3,
+    PASSWD,
+    PASSWD_2,
+    USERNAME,
+    USERNAME_2,
+    USERNAME_3,
+)
+from tests.utils import delete_user, get_user, login, record_queries, register
+
+
+async def test_create_post(ac: AsyncClient):
+    if len(await get_user(EMAIL)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL, username=USERNAME, password=PASSWD
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL)) == 1
+
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    post_to_create = PostCreate(title="Тестовый пост", text="Текст для тестового поста")
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} успешно опубликовал пост",
+    )
+    async with async_session_maker() as session:
+        response = await create_post_json(
+            post_to_create=post_to_create, user_id=user_id, session=session
+        )
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_view_post_uses_one_connection(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    response = await login(ac=ac, email=EMAIL, password=PASSWD)
+    assert response.status_code == 204
+    cookies = {"fastapiusersauth": response.cookies["fastapiusersauth"]}
+
+    checkouts = []
+
+    def on_checkout(*args):
+        checkouts.append(args)
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    try:
+        response = await ac.put(f"feed/view_post/{post_id}", cookies=cookies)
+    finally:
+        event.remove(engine.sync_engine, "checkout", on_checkout)
+
+    assert response.json()["status"] == STATUS[200]
+    assert len(checkouts) == 1
+
+
+async def test_current_user_from_cache(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    response = await login(ac=ac, email=EMAIL, password=PASSWD)
+    assert response.status_code == 204
+    cookies = {"fastapiusersauth": response.cookies["fastapiusersauth"]}
+
+    user_cache.invalidate(user_id)
+    with record_queries() as statements:
+        for _ in range(2):
+            response = await ac.put(f"feed/view_post/{post_id}", cookies=cookies)
+            assert response.json()["status"] == STATUS[200]
+    user_queries = [
+        statement for statement, _ in statements if 'FROM "user"' in statement
+    ]
+    assert len(user_queries) == 1
+    assert user_cache.get(user_id)["id"] == user_id
+
+    strategy = get_jwt_strategy()
+    async with async_session_maker() as session:
+        user_manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        first = await strategy.read_token(cookies["fastapiusersauth"], user_manager)
+        second = await strategy.read_token(cookies["fastapiusersauth"], user_manager)
+    assert first.id == second.id == user_id
+    assert first is not second
+
+    async with async_session_maker() as session:
+        user_manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        await user_manager.update(
+            UserUpdate(name=USERNAME), await user_manager.get(user_id)
+        )
+    assert user_cache.get(user_id) is None
+
+
+async def test_right_edit_post(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    assert isinstance(post_id, int)
+
+    post_update = PostUpdate(id=post_id, title="Новый загаловок", text="Новый текст")
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пост #{post_id} успешно изменён пользователем #{user_id}",
+    )
+
+    async with async_session_maker() as session:
+        response = await edit_post_json(
+            post_update=post_update, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_get_post_from_cache():
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    post_cache.invalidate(post_id)
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            first = await get_post_by_post_id_json(post_id=post_id, session=session)
+            second = await get_post_by_post_id_json(post_id=post_id, session=session)
+    assert first == second
+    assert len(statements) == 1
+
+    post_update = PostUpdate(id=post_id, title="Изменённый загаловок", text="Текст")
+    async with async_session_maker() as session:
+        await edit_post_json(post_update=post_update, user_id=user_id, session=session)
+        edited = await get_post_by_post_id_json(post_id=post_id, session=session)
+    assert edited["data"][0]["title"] == "Изменённый загаловок"
+
+
+async def test_edit_post_with_wrong_user(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    assert isinstance(post_id, int)
+
+    post_update = PostUpdate(id=post_id, title="Новый загаловок", text="Новый текст")
+
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    wrong_user = await get_user(email=EMAIL_2)
+    wrong_user_id = wrong_user[0][0].id
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пользователь #{wrong_user_id} не имеет права изменять пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        response = await edit_post_json(
+            post_update=post_update, user_id=wrong_user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_edit_post_with_wrong_post(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    assert isinstance(post_id, int)
+
+    wrong_post_id = post_id + 1
+
+    post_update = PostUpdate(
+        id=wrong_post_id, title="Новый загаловок", text="Новый текст"
+    )
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пост #{wrong_post_id} не существует",
+    )
+
+    async with async_session_maker() as session:
+        response = await edit_post_json(
+            post_update=post_update, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_view_post():
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пост #{post_id} успешно просмотрем пользователем #{user_id}",
+    )
+
+    async with async_session_maker() as session:
+        response = await view_post_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_view_post_with_wrong_post():
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    wrong_post_id = posts["data"][0]["id"] + 1
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пост #{wrong_post_id} не существует",
+    )
+
+    async with async_session_maker() as session:
+        response = await view_post_json(
+            post_id=wrong_post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_view_counter_buffer():
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+    views = posts["data"][0]["views"] or 0
+
+    buffer = ViewCounterBuffer(flush_interval=60, max_pending=100)
+    for _ in range(3):
+        buffer.add(post_id=post_id)
+    assert buffer.pending(post_id=post_id) == 3
+
+    assert await buffer.flush() == 1
+    assert buffer.pending(post_id=post_id) == 0
+
+    async with async_session_maker() as session:
+        post_json = await get_post_by_post_id_json(post_id=post_id, session=session)
+    assert post_json["data"][0]["views"] == views + 3
+
+
+async def test_view_counter_buffer_stop_during_flush(monkeypatch):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+    views = posts["data"][0]["views"] or 0
+
+    buffer = ViewCounterBuffer(flush_interval=60, max_pending=1)
+    writing = asyncio.Event()
+    write = ViewCounterBuffer._write
+
+    async def slow_write(pending, session):
+        writing.set()
+        await asyncio.sleep(0.1)
+        await write(pending=pending, session=session)
+
+    monkeypatch.setattr(buffer, "_write", slow_write)
+
+    # a cancelled flush puts its batch back
+    buffer.add(post_id=post_id)
+    task = asyncio.create_task(buffer.flush())
+    await writing.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert buffer.pending(post_id=post_id) == 1
+
+    # stop() waits for the flush the loop is running
+    writing.clear()
+    buffer.start()
+    buffer.add(post_id=post_id)
+    await writing.wait()
+    await buffer.stop()
+    assert buffer.pending(post_id=post_id) == 0
+
+    async with async_session_maker() as session:
+        post_json = await get_post_by_post_id_json(post_id=post_id, session=session)
+    assert post_json["data"][0]["views"] == views + 2
+
+
+async def test_like_post_by_author(ac: AsyncClient):
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пользователь #{auth_id} попытался поставить реакцию на свой пост #{post_id} ",
+    )
+
+    async with async_session_maker() as session:
+        response = await like_post_json(
+            post_id=post_id, user_id=auth_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_like_post(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} успешно поставил лайк на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+        response = await like_post_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 1,
+        "likes": 1,
+        "dislikes": 0,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_double_like_post(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} уже ставил лайк на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await like_post_json(post_id=post_id, user_id=user_id, session=session)
+        response = await like_post_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 1,
+        "likes": 1,
+        "dislikes": 0,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_change_dislike_to_like_post(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} убрал дизлайк и поставил лайк на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await dislike_post_json(post_id=post_id, user_id=user_id, session=session)
+        response = await like_post_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 1,
+        "likes": 1,
+        "dislikes": 0,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_concurrent_like_post(ac: AsyncClient):
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    async with async_session_maker() as session:
+        await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    async def like():
+        async with async_session_maker() as session:
+            return await like_post_json(
+                post_id=post_id, user_id=user_id, session=session
+            )
+
+    responses = await asyncio.gather(*(like() for _ in range(5)))
+
+    assert all(response["status"] == STATUS[200] for response in responses)
+    assert [response["message"] for response in responses].count(
+        f"Пользователь #{user_id} успешно поставил лайк на пост #{post_id}"
+    ) == 1
+
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+    assert get_likes_json["data"][0]["total_reactions"] == 1
+
+
+async def test_like_post_with_wrong_post():
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    wrong_post_id = posts["data"][0]["id"] + 1
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пост #{wrong_post_id} не существует",
+    )
+
+    async with async_session_maker() as session:
+        response = await like_post_json(
+            post_id=wrong_post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_like_post_with_database_error():
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+    # the id is out of the range of the integer column
+    post_id = 2**40
+
+    async with async_session_maker() as session:
+        response = await like_post_json(
+            post_id=post_id, user_id=auth_id, session=session
+        )
+
+    assert response["status"] == STATUS[400]
+    assert response["message"] == (
+        f"Произошла ошибка при попытке поставить лайк на пост #{post_id} "
+        f"пользователем #{auth_id}"
+    )
+    assert response["details"]
+
+
+async def test_reconcile_reaction_counters():
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    async with async_session_maker() as session:
+        right_likes = await get_likes_by_post_id_json(post_id=post_id, session=session)
+        await session.execute(
+            update(post)
+            .where(post.c.id == post_id)
+            .values(likes_count=100, dislikes_count=100)
+        )
+        await session.commit()
+
+    async with async_session_maker() as session:
+        repaired = await reconcile_reaction_counters(
+            session=session, post_ids=[post_id]
+        )
+    assert repaired == 1
+
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+    assert get_likes_json["data"] == right_likes["data"]
+
+
+async def test_get_reactions_of_many_posts():
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+    wrong_post_id = post_id + 1
+
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        response = await get_likes_by_post_ids_json(
+            post_ids=[post_id, wrong_post_id, post_id], session=session
+        )
+
+    assert response["status"] == STATUS[200]
+    assert response["message"] == (
+        f"Получены реакции на посты, не найдены посты #{wrong_post_id}"
+    )
+    assert response["data"] == [
+        {"post_id": post_id, **get_likes_json["data"][0]},
+        {
+            "post_id": wrong_post_id,
+            "total_reactions": None,
+            "likes": None,
+            "dislikes": None,
+        },
+    ]
+
+
+async def test_apply_reactions(ac: AsyncClient):
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+    wrong_post_id = post_id + 1
+
+    async def apply(user_id: int, *operations: tuple) -> list:
+        async with async_session_maker() as session:
+            response = await apply_reactions_json(
+                operations=[
+                    ReactionOperation(post_id=post_id, action=action)
+                    for post_id, action in operations
+                ],
+                user_id=user_id,
+                session=session,
+            )
+        assert response["status"] == STATUS[200]
+        return [data["result"] for data in response["data"]]
+
+    async def get_likes() -> dict:
+        async with async_session_maker() as session:
+            response = await get_likes_by_post_id_json(post_id=post_id, session=session)
+        return response["data"][0]
+
+    initial_likes = await get_likes()
+    assert await apply(user_id, (post_id, "remove")) == ["removed"]
+    removed_likes = await get_likes()
+
+    results = await apply(
+        user_id, (post_id, "dislike"), (post_id, "like"), (wrong_post_id, "like")
+    )
+    assert results == ["superseded", "created", "not_found"]
+    assert await get_likes() == {
+        **removed_likes,
+        "total_reactions": removed_likes["total_reactions"] + 1,
+        "likes": removed_likes["likes"] + 1,
+    }
+
+    assert await apply(auth_id, (post_id, "dislike")) == ["own_post"]
+    assert await apply(user_id, (post_id, "like")) == ["unchanged"]
+    assert await apply(user_id, (post_id, "dislike")) == ["changed"]
+    assert await get_likes() == {
+        **removed_likes,
+        "total_reactions": removed_likes["total_reactions"] + 1,
+        "dislikes": removed_likes["dislikes"] + 1,
+    }
+
+    results = await apply(user_id, (post_id, "remove"), (wrong_post_id, "remove"))
+    assert results == ["removed", "absent"]
+    assert await get_likes() == removed_likes
+
+    assert await apply(user_id, (post_id, "like")) == ["created"]
+    assert await get_likes() == initial_likes
+
+
+async def test_apply_reactions_with_database_error():
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+    # the id is out of the range of the integer column
+    operations = [ReactionOperation(post_id=2**40, action="like")]
+
+    async with async_session_maker() as session:
+        response = await apply_reactions_json(
+            operations=operations, user_id=auth_id, session=session
+        )
+
+    assert response["status"] == STATUS[400]
+    assert response["message"] == (
+        f"Произошла ошибка при применении реакций пользователем #{auth_id}"
+    )
+    assert "out of int32 range" in response["details"]
+
+
+async def test_trending_posts():
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        for title in ("Непопулярный пост", "Популярный пост"):
+            await create_post_json(
+                post_to_create=PostCreate(title=title, text="Текст"),
+                user_id=auth_id,
+                session=session,
+            )
+        posts = await get_posts_by_user_id_json(
+            user_id=auth_id, session=session, limit=2
+        )
+        popular_id, unpopular_id = [data["id"] for data in posts["data"]]
+        await like_post_json(post_id=popular_id, user_id=user_id, session=session)
+        await dislike_post_json(post_id=unpopular_id, user_id=user_id, session=session)
+    buffer = ViewCounterBuffer(flush_interval=0)
+    async with async_session_maker() as session:
+        for _ in range(2):
+            await buffer.record(post_id=popular_id, session=session)
+
+    async def get_trend_scores() -> dict:
+        async with async_session_maker() as session:
+            response = await get_trending_posts_json(session=session, limit=100)
+        assert response["status"] == STATUS[200]
+        return {data["id"]: data["trend_score"] for data in response["data"]}
+
+    trending_posts.clear()
+    trend_scores = await get_trend_scores()
+    ids = list(trend_scores)
+    assert ids.index(popular_id) < ids.index(unpopular_id)
+    assert trend_scores[popular_id] == pytest.approx(
+        TREND_LIKE_WEIGHT + 2 * TREND_VIEW_WEIGHT, rel=1e-3
+    )
+    assert trend_scores[unpopular_id] == pytest.approx(TREND_DISLIKE_WEIGHT, rel=1e-3)
+
+    async with async_session_maker() as session:
+        await remove_the_reaction_json(
+            post_id=popular_id, user_id=user_id, session=session
+        )
+    assert await get_trend_scores() == trend_scores
+    trending_posts.clear()
+    assert (await get_trend_scores())[popular_id] == pytest.approx(
+        2 * TREND_VIEW_WEIGHT, rel=1e-3
+    )
+
+    async with async_session_maker() as session:
+        for post_id in (popular_id, unpopular_id):
+            await delete_post_json(post_id=post_id, user_id=auth_id, session=session)
+
+
+async def test_dislike_post_by_author(ac: AsyncClient):
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пользователь #{auth_id} попытался поставить реакцию на свой пост #{post_id} ",
+    )
+
+    async with async_session_maker() as session:
+        response = await dislike_post_json(
+            post_id=post_id, user_id=auth_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_dislike_post(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} успешно поставил дизлайк на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+        response = await dislike_post_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 1,
+        "likes": 0,
+        "dislikes": 1,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_double_dislike_post(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} уже ставил дизлайк на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await dislike_post_json(post_id=post_id, user_id=user_id, session=session)
+        response = await dislike_post_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 1,
+        "likes": 0,
+        "dislikes": 1,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_change_like_to_dislike_post(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} убрал лайк и поставил дизлайк на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await like_post_json(post_id=post_id, user_id=user_id, session=session)
+        response = await dislike_post_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 1,
+        "likes": 0,
+        "dislikes": 1,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_remove_the_reaction(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[200],
+        message=f"Пользователь #{user_id} убрал реакцию на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await like_post_json(post_id=post_id, user_id=user_id, session=session)
+        response = await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    async with async_session_maker() as session:
+        await dislike_post_json(post_id=post_id, user_id=user_id, session=session)
+        response = await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 0,
+        "likes": 0,
+        "dislikes": 0,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_remove_the_reaction_with_database_error():
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+    # the id is out of the range of the integer column
+    post_id = 2**40
+
+    async with async_session_maker() as session:
+        response = await remove_the_reaction_json(
+            post_id=post_id, user_id=auth_id, session=session
+        )
+
+    assert response["status"] == STATUS[400]
+    assert response["message"] == (
+        f"Произошла ошибка при попытке убрать реакцию на пост #{post_id} "
+        f"пользователем #{auth_id}"
+    )
+
+
+async def test_double_remove_the_reaction(ac: AsyncClient):
+    if len(await get_user(EMAIL_2)) == 0:
+        response = await register(
+            ac=ac, email=EMAIL_2, username=USERNAME_2, password=PASSWD_2
+        )
+        assert response.status_code == 201
+    assert len(await get_user(EMAIL_2)) == 1
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пользователь #{user_id} ещё не ставил реакцию на пост #{post_id}",
+    )
+
+    async with async_session_maker() as session:
+        await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+        response = await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+    right_get_likes_data = {
+        "total_reactions": 0,
+        "likes": 0,
+        "dislikes": 0,
+    }
+    async with async_session_maker() as session:
+        get_likes_json = await get_likes_by_post_id_json(
+            post_id=post_id, session=session
+        )
+        get_likes_data = get_likes_json["data"][0]
+
+    for key, value in right_get_likes_data.items():
+        assert value == get_likes_data[key] or value is get_likes_data[key]
+
+
+async def test_get_posts_by_pages():
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        for number in range(3):
+            await create_post_json(
+                post_to_create=PostCreate(title=f"Пост #{number}", text="Текст"),
+                user_id=user_id,
+                session=session,
+            )
+
+    async with async_session_maker() as session:
+        first_page = await get_posts_by_user_id_json(
+            user_id=user_id, session=session, limit=2
+        )
+        second_page = await get_posts_by_user_id_json(
+            user_id=user_id,
+            session=session,
+            limit=2,
+            cursor=first_page["next_cursor"],
+        )
+        wrong_page = await get_posts_by_user_id_json(
+            user_id=user_id, session=session, limit=2, cursor="wrong"
+        )
+
+    first_titles = [data["title"] for data in first_page["data"]]
+    second_titles = [data["title"] for data in second_page["data"]]
+    assert first_titles == ["Пост #2", "Пост #1"]
+    assert second_titles == ["Пост #0"]
+    assert second_page["next_cursor"] is None
+    assert wrong_page["status"] == STATUS[400]
+
+    async with async_session_maker() as session:
+        for data in first_page["data"] + second_page["data"]:
+            await delete_post_json(post_id=data["id"], user_id=user_id, session=session)
+
+
+async def test_get_posts_response(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+
+    response = await ac.get(f"feed/get_posts/{user_id}")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == posts
+
+
+async def test_feed_routes_skip_jsonable_encoder(ac: AsyncClient, monkeypatch):
+    feed_routes = [route for route in app.routes if route.path.startswith("/feed/")]
+    assert feed_routes
+    assert all(route.response_field is None for route in feed_routes)
+
+    def jsonable_encoder(*args, **kwargs):
+        raise AssertionError("jsonable_encoder is called")
+
+    monkeypatch.setattr(fastapi.routing, "jsonable_encoder", jsonable_encoder)
+
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    for url in (
+        f"feed/get_reactions/{post_id}",
+        f"feed/get_reactions?post_ids={post_id}",
+        "feed/search?query=пост",
+        "feed/trending",
+    ):
+        response = await ac.get(url)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["status"] == STATUS[200]
+
+
+async def test_conditional_get_posts(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    urls = [f"feed/get_post/{post_id}", f"feed/get_posts/{user_id}"]
+    etags = []
+    for url in urls:
+        response = await ac.get(url)
+        etag = response.headers["etag"]
+        post_cache.invalidate(post_id)
+        with record_queries() as statements:
+            response = await ac.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+        # only the ids and the versions are read for a 304
+        post_queries = [statement for statement, _ in statements if "post" in statement]
+        assert len(post_queries) == 1
+        assert "post.title" not in post_queries[0]
+        response = await ac.get(url, headers={"If-None-Match": f'W/{etag}, "old"'})
+        assert response.status_code == 304
+        etags.append(etag)
+
+    buffer = ViewCounterBuffer(flush_interval=0)
+    async with async_session_maker() as session:
+        await buffer.record(post_id=post_id, session=session)
+
+    for url, etag in zip(urls, etags):
+        response = await ac.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["status"] == STATUS[200]
+
+    response = await ac.get(f"feed/get_post/{post_id + 1}")
+    assert "etag" not in response.headers
+
+
+async def test_reactions_invalidate_cached_post():
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    post_id = posts["data"][0]["id"]
+
+    async def get_versions() -> tuple:
+        async with async_session_maker() as session:
+            post_json = await get_post_by_post_id_json(post_id=post_id, session=session)
+            posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+        return post_json["data"][0]["version"], posts["data"][0]["version"]
+
+    async def like(session: AsyncSession) -> None:
+        await like_post_json(post_id=post_id, user_id=user_id, session=session)
+
+    async def remove(session: AsyncSession) -> None:
+        await remove_the_reaction_json(
+            post_id=post_id, user_id=user_id, session=session
+        )
+
+    async def apply_like(session: AsyncSession) -> None:
+        await apply_reactions_json(
+            operations=[ReactionOperation(post_id=post_id, action="like")],
+            user_id=user_id,
+            session=session,
+        )
+
+    async def apply_remove(session: AsyncSession) -> None:
+        await apply_reactions_json(
+            operations=[ReactionOperation(post_id=post_id, action="remove")],
+            user_id=user_id,
+            session=session,
+        )
+
+    async def reconcile(session: AsyncSession) -> None:
+        await session.execute(
+            update(post).where(post.c.id == post_id).values(likes_count=100)
+        )
+        await session.commit()
+        assert await reconcile_reaction_counters(session=session) == 1
+
+    for change in (like, remove, apply_like, apply_remove, reconcile):
+        version, _ = await get_versions()
+        assert post_cache.get(post_id) is not None
+        async with async_session_maker() as session:
+            await change(session)
+        cached_version, listed_version = await get_versions()
+        assert cached_version == listed_version > version
+
+
+async def test_create_posts():
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    posts_to_create = [
+        {"title": "Первый пост", "text": "Текст"},
+        {"title": "Пост без текста"},
+        {"title": "Второй пост", "text": "Текст"},
+        "Не пост",
+        {"title": "Третий пост", "text": "Текст"},
+    ]
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            response = await create_posts_json(
+                posts_to_create=posts_to_create, user_id=user_id, session=session
+            )
+    assert response["status"] == STATUS[200]
+    inserts = [
+        statement for statement, _ in statements if "INSERT INTO post" in statement
+    ]
+    assert len(inserts) == 1
+
+    data = response["data"]
+    assert [item["index"] for item in data] == [0, 1, 2, 3, 4]
+    assert [item["errors"] is None for item in data] == [
+        True,
+        False,
+        True,
+        False,
+        True,
+    ]
+    created_ids = [item["id"] for item in data if item["id"] is not None]
+    assert created_ids == sorted(created_ids)
+
+    async with async_session_maker() as session:
+        for post_id, title in zip(
+            created_ids, ["Первый пост", "Второй пост", "Третий пост"]
+        ):
+            created = await get_post_by_post_id_json(post_id=post_id, session=session)
+            assert created["data"][0]["title"] == title
+            await delete_post_json(post_id=post_id, user_id=user_id, session=session)
+
+
+async def get_home_feed_ids(user_id: int, **kwargs) -> list:
+    async with async_session_maker() as session:
+        response = await get_home_feed_json(user_id=user_id, session=session, **kwargs)
+    assert response["status"] == STATUS[200]
+    return [data["id"] for data in response["data"]]
+
+
+async def test_follow_user(ac: AsyncClient):
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+        response = await follow_user_json(
+            followee_id=auth_id, user_id=user_id, session=session
+        )
+        assert response["message"] == (
+            f"Пользователь #{user_id} подписался на пользователя #{auth_id}"
+        )
+        response = await follow_user_json(
+            followee_id=auth_id, user_id=user_id, session=session
+        )
+        assert response["status"] == STATUS[200]
+        assert response["message"] == (
+            f"Пользователь #{user_id} уже подписан на пользователя #{auth_id}"
+        )
+        response = await follow_user_json(
+            followee_id=user_id, user_id=user_id, session=session
+        )
+        assert response["status"] == STATUS[400]
+        wrong_user_id = max(user_id, auth_id) + 1
+        response = await follow_user_json(
+            followee_id=wrong_user_id, user_id=user_id, session=session
+        )
+        assert response["message"] == f"Пользователь #{wrong_user_id} не существует"
+    auth = await get_user(email=EMAIL)
+    assert auth[0][0].followers_count == 1
+
+    posts_ids = [data["id"] for data in posts["data"]]
+    assert await get_home_feed_ids(user_id) == posts_ids
+
+    async with async_session_maker() as session:
+        await create_post_json(
+            post_to_create=PostCreate(title="Пост для подписчиков", text="Текст"),
+            user_id=auth_id,
+            session=session,
+        )
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    new_post_id = posts["data"][0]["id"]
+    assert await get_home_feed_ids(user_id) == [new_post_id] + posts_ids
+
+    async with async_session_maker() as session:
+        await delete_post_json(post_id=new_post_id, user_id=auth_id, session=session)
+    assert await get_home_feed_ids(user_id) == posts_ids
+
+    async with async_session_maker() as session:
+        response = await unfollow_user_json(
+            followee_id=auth_id, user_id=user_id, session=session
+        )
+        assert response["message"] == (
+            f"Пользователь #{user_id} отписался от пользователя #{auth_id}"
+        )
+        response = await unfollow_user_json(
+            followee_id=auth_id, user_id=user_id, session=session
+        )
+        assert response["status"] == STATUS[400]
+    assert await get_home_feed_ids(user_id) == []
+    auth = await get_user(email=EMAIL)
+    assert auth[0][0].followers_count == 0
+
+
+async def test_home_feed_of_popular_author(ac: AsyncClient, monkeypatch):
+    monkeypatch.setattr("src.feed.utils.TIMELINE_FANOUT_MAX_FOLLOWERS", 1)
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+    response = await login(ac=ac, email=EMAIL_2, password=PASSWD_2)
+    cookies = {"fastapiusersauth": response.cookies["fastapiusersauth"]}
+
+    response = await ac.put(f"feed/follow/{auth_id}", cookies=cookies)
+    assert response.json()["status"] == STATUS[200]
+    async with async_session_maker() as session:
+        for number in range(2):
+            await create_post_json(
+                post_to_create=PostCreate(title=f"Пост #{number}", text="Текст"),
+                user_id=auth_id,
+                session=session,
+            )
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+    posts_ids = [data["id"] for data in posts["data"]]
+
+    first_page = await ac.get("feed/home", params={"limit": 1}, cookies=cookies)
+    first_page = first_page.json()
+    second_page = await ac.get(
+        "feed/home",
+        params={"limit": len(posts_ids), "cursor": first_page["next_cursor"]},
+        cookies=cookies,
+    )
+    second_page = second_page.json()
+    assert [data["id"] for data in first_page["data"]] == posts_ids[:1]
+    assert [data["id"] for data in second_page["data"]] == posts_ids[1:]
+    assert second_page["next_cursor"] is None
+
+    response = await ac.delete(f"feed/unfollow/{auth_id}", cookies=cookies)
+    assert response.json()["status"] == STATUS[200]
+    assert await get_home_feed_ids(user_id) == []
+    async with async_session_maker() as session:
+        for post_id in posts_ids[:2]:
+            await delete_post_json(post_id=post_id, user_id=auth_id, session=session)
+
+
+async def test_home_feed_after_author_loses_followers(monkeypatch):
+    monkeypatch.setattr("src.feed.utils.TIMELINE_FANOUT_MAX_FOLLOWERS", 2)
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        follower = User(email=EMAIL_3, name=USERNAME_3, hashed_password="-")
+        session.add(follower)
+        await session.commit()
+        follower_id = follower.id
+
+        for reader_id in (follower_id, user_id):
+            await follow_user_json(
+                followee_id=auth_id, user_id=reader_id, session=session
+            )
+        # published with 2 followers, so it is merged into home feeds on read
+        await create_post_json(
+            post_to_create=PostCreate(title="Пост популярного автора", text="Текст"),
+            user_id=auth_id,
+            session=session,
+        )
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+        post_id = posts["data"][0]["id"]
+    assert post_id in await get_home_feed_ids(follower_id)
+
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await unfollow_user_json(
+                followee_id=auth_id, user_id=user_id, session=session
+            )
+    # the post is still merged on read instead of being copied to timelines
+    assert len(statements) == 1
+    async with async_session_maker() as session:
+        pushed = await session.execute(
+            select(timeline.c.user_id).where(timeline.c.post_id == post_id)
+        )
+        assert pushed.all() == []
+        await create_post_json(
+            post_to_create=PostCreate(title="Пост после отписки", text="Текст"),
+            user_id=auth_id,
+            session=session,
+        )
+        posts = await get_posts_by_user_id_json(user_id=auth_id, session=session)
+        new_post_id = posts["data"][0]["id"]
+    assert (await get_home_feed_ids(follower_id))[:2] == [new_post_id, post_id]
+    assert await get_home_feed_ids(
+        follower_id, limit=1, cursor=encode_cursor(new_post_id)
+    ) == [post_id]
+
+    async with async_session_maker() as session:
+        await unfollow_user_json(
+            followee_id=auth_id, user_id=follower_id, session=session
+        )
+        for deleted_post_id in (post_id, new_post_id):
+            await delete_post_json(
+                post_id=deleted_post_id, user_id=auth_id, session=session
+            )
+    await delete_user(EMAIL_3)
+
+
+async def test_search_posts(ac: AsyncClient):
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        for author_id, title, text in (
+            (user_id, "Заметки о программировании", "Про базы данных"),
+            (user_id, "Путешествия", "Программирование в поездах"),
+            (auth_id, "Программирование на Python", "Текст"),
+        ):
+            await create_post_json(
+                post_to_create=PostCreate(title=title, text=text),
+                user_id=author_id,
+                session=session,
+            )
+        user_posts = await get_posts_by_user_id_json(
+            user_id=user_id, session=session, limit=2
+        )
+        auth_posts = await get_posts_by_user_id_json(
+            user_id=auth_id, session=session, limit=1
+        )
+    travel_id, notes_id = [data["id"] for data in user_posts["data"]]
+    python_id = auth_posts["data"][0]["id"]
+
+    async def search(**kwargs) -> dict:
+        async with async_session_maker() as session:
+            response = await search_posts_json(session=session, **kwargs)
+        assert response["status"] == STATUS[200]
+        return response
+
+    first_page = await search(query="программирование", user_id=user_id, limit=1)
+    second_page = await search(
+        query="программирование",
+        user_id=user_id,
+        limit=1,
+        cursor=first_page["next_cursor"],
+    )
+    assert [data["id"] for data in first_page["data"]] == [notes_id]
+    assert [data["id"] for data in second_page["data"]] == [travel_id]
+    assert second_page["next_cursor"] is None
+
+    response = await ac.get("feed/search", params={"query": "программирование"})
+    found_ids = [data["id"] for data in response.json()["data"]]
+    assert {notes_id, travel_id, python_id} <= set(found_ids)
+    assert found_ids.index(python_id) < found_ids.index(travel_id)
+    assert [data["id"] for data in (await search(query="python -базы"))["data"]] == [
+        python_id
+    ]
+
+    async with async_session_maker() as session:
+        await edit_post_json(
+            post_update=PostUpdate(id=travel_id, title="Путешествия", text="Горы"),
+            user_id=user_id,
+            session=session,
+        )
+        wrong_page = await search_posts_json(
+            query="программирование", session=session, cursor="wrong"
+        )
+    assert wrong_page["status"] == STATUS[400]
+    assert [data["id"] for data in (await search(query="гора"))["data"]] == [travel_id]
+    response = await search(query="программирование", user_id=user_id)
+    assert [data["id"] for data in response["data"]] == [notes_id]
+
+    async with async_session_maker() as session:
+        for post_id, author_id in (
+            (notes_id, user_id),
+            (travel_id, user_id),
+            (python_id, auth_id),
+        ):
+            await delete_post_json(post_id=post_id, user_id=author_id, session=session)
+
+
+async def test_delete_posts(ac: AsyncClient):
+    user = await get_user(email=EMAIL_2)
+    user_id = user[0][0].id
+
+    auth = await get_user(email=EMAIL)
+    auth_id = auth[0][0].id
+
+    async with async_session_maker() as session:
+        response = await create_posts_json(
+            posts_to_create=[
+                {"title": "Первый пост", "text": "Текст"},
+                {"title": "Второй пост", "text": "Текст"},
+            ],
+            user_id=user_id,
+            session=session,
+        )
+        post_ids = [item["id"] for item in response["data"]]
+        wrong_post_id = post_ids[-1] + 1
+        await like_post_json(post_id=post_ids[0], user_id=auth_id, session=session)
+
+        response = await delete_posts_json(
+            post_ids=[post_ids[0], wrong_post_id], user_id=auth_id, session=session
+        )
+    assert [item["result"] for item in response["data"]] == ["forbidden", "not_found"]
+
+    response = await login(ac=ac, email=EMAIL_2, password=PASSWD_2)
+    cookies = {"fastapiusersauth": response.cookies["fastapiusersauth"]}
+    response = await ac.request(
+        "DELETE",
+        "feed/delete_posts",
+        json=post_ids + [wrong_post_id, post_ids[0]],
+        cookies=cookies,
+    )
+    response = response.json()
+    assert response["message"] == f"Пользователь #{user_id} удалил постов: 2 из 3"
+    assert response["data"] == [
+        {"post_id": post_ids[0], "result": "deleted"},
+        {"post_id": post_ids[1], "result": "deleted"},
+        {"post_id": wrong_post_id, "result": "not_found"},
+    ]
+
+    async with async_session_maker() as session:
+        for post_id in post_ids:
+            deleted = await get_post_by_post_id_json(post_id=post_id, session=session)
+            assert deleted["status"] == STATUS[400]
+        assert (
+            await get_all_user_post_by_post_id(post_id=post_ids[0], session=session)
+            == []
+        )
+
+
+async def test_export_posts(ac: AsyncClient):
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+
+    response = await login(ac=ac, email=EMAIL, password=PASSWD)
+    cookies = {"fastapiusersauth": response.cookies["fastapiusersauth"]}
+    response = await ac.get("feed/export_posts", cookies=cookies)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == sorted(posts["data"], key=lambda data: data["id"])
+
+    response = await ac.get("feed/export_posts")
+    assert response.status_code == 401
+
+    response = await login(ac=ac, email=EMAIL_2, password=PASSWD_2)
+    cookies = {"fastapiusersauth": response.cookies["fastapiusersauth"]}
+    for params in ({"user_id": user_id}, {"all_users": True}):
+        response = await ac.get("feed/export_posts", params=params, cookies=cookies)
+        assert response.json()["status"] == STATUS[400]
+
+    superuser = await get_user(email=EMAIL_2)
+    superuser_id = superuser[0][0].id
+    async with async_session_maker() as session:
+        await session.execute(
+            update(User).where(User.id == superuser_id).values(is_superuser=True)
+        )
+        await session.commit()
+    user_cache.invalidate(superuser_id)
+    try:
+        response = await ac.get(
+            "feed/export_posts", params={"user_id": user_id}, cookies=cookies
+        )
+        exported = [json.loads(line) for line in response.text.splitlines()]
+        assert exported == sorted(posts["data"], key=lambda data: data["id"])
+
+        response = await ac.get(
+            "feed/export_posts", params={"all_users": True}, cookies=cookies
+        )
+        exported_ids = {
+            json.loads(line)["user_id"] for line in response.text.splitlines()
+        }
+        assert user_id in exported_ids
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(
+                update(User).where(User.id == superuser_id).values(is_superuser=False)
+            )
+            await session.commit()
+        user_cache.invalidate(superuser_id)
+
+
+async def test_export_posts_with_database_error():
+    # the id is out of the range of the integer column
+    with pytest.raises(DBAPIError):
+        async for _ in export_posts_ndjson(user_id=2**40):
+            pass
+
+
+async def test_delete_post_with_wrong_user():
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    posts_data = posts["data"]
+
+    wrong_user_id = user_id + 1
+
+    for data in posts_data:
+        post_id = data["id"]
+        right_response = return_json(
+            status=STATUS[400],
+            message=f"Пользователь #{wrong_user_id} не имеет права удалять пост #{post_id}",
+        )
+        async with async_session_maker() as session:
+            response = await delete_post_json(
+                post_id=post_id, user_id=wrong_user_id, session=session
+            )
+        for key, value in right_response.items():
+            assert value == response[key] or value is response[key]
+
+
+async def test_delete_post_with_wrong_post():
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    wrong_post_id = posts["data"][0]["id"] + 1
+
+    right_response = return_json(
+        status=STATUS[400],
+        message=f"Пост #{wrong_post_id} не существует",
+    )
+    async with async_session_maker() as session:
+        response = await delete_post_json(
+            post_id=wrong_post_id, user_id=user_id, session=session
+        )
+    for key, value in right_response.items():
+        assert value == response[key] or value is response[key]
+
+
+async def test_delete_post():
+    user = await get_user(email=EMAIL)
+    user_id = user[0][0].id
+
+    async with async_session_maker() as session:
+        posts = await get_posts_by_user_id_json(user_id=user_id, session=session)
+    posts_data = posts["data"]
+
+    for data in posts_data:
+        post_id = data["id"]
+        right_response = return_json(
+            status=STATUS[200],
+            message=f"Пост #{post_id} успешно удален",
+        )
+        async with async_session_maker() as session:
+            response = await delete_post_json(
+                post_id=post_id, user_id=user_id, session=session
+            )
+        for key, value in right_response.items():
+            assert value == response[key] or value is response[key]
+
+
+async def test_delete_user():
+    await delete_user(EMAIL)
+    assert len(await get_user(EMAIL)) == 0
+    await delete_user(EMAIL_2)
+    assert len(await get_user(EMAIL_2)) == 0
@@ -0,0 +1,43 @@
+from httpx import AsyncClient
+
+from src.metrics import Counter, Histogram, db_queries_per_request, http_requests
+
+
+def test_counter_samples():
+    counter = Counter("requests_total", "Requests.", ("route",))
+    counter.inc('/feed/"quoted"')
+    counter.inc('/feed/"quoted"', amount=2)
+    assert counter.samples() == ['requests_total{route="/feed/\\"quoted\\""} 3']
+
+
+def test_histogram_samples():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value)
+    assert histogram.samples() == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 5.65",
+        "latency_seconds_count 4",
+    ]
+
+
+async def test_metrics_of_route(ac: AsyncClient):
+    route = "/feed/get_post/{post_id}"
+    requests = http_requests.get("GET", route, "200")
+    queries = db_queries_per_request.sum(route)
+
+    response = await ac.get("feed/get_post/0")
+    assert response.status_code == 200
+    assert http_requests.get("GET", route, "200") == requests + 1
+    assert db_queries_per_request.sum(route) == queries + 1
+
+    response = await ac.get("metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        f'http_requests_total{{method="GET",route="{route}",status="200"}} '
+        f"{requests + 1}" in response.text
+    )
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
@@ -0,0 +1,395 @@
+"""
+Runs the database functions of the feed module against a seeded database,
+checks that every statement they send is planned without sequential scans
+and on the expected indexes, and limits the number of statements per call.
+"""
+from typing import Iterable
+
+import pytest
+from fastapi_users.db import SQLAlchemyUserDatabase
+from sqlalchemy import delete, insert, select, text, update
+
+from src.auth.models import User
+from src.database import async_session_maker
+from src.feed.cache import post_cache
+from src.feed.models import follow, post, timeline, user_post
+from src.feed.schemas import PostCreate, PostUpdate, ReactionOperation
+from src.feed.trending import TrendingPosts
+from src.feed.utils import (
+    apply_reactions_json,
+    create_post_json,
+    delete_post_json,
+    delete_posts_json,
+    dislike_post_json,
+    edit_post_json,
+    follow_user_json,
+    get_all_user_post_by_post_id,
+    get_home_feed_json,
+    get_likes_by_post_id_json,
+    get_likes_by_post_ids_json,
+    get_post_by_id,
+    get_post_by_post_id_json,
+    get_post_etag,
+    get_posts_by_user_id_json,
+    get_posts_etag,
+    like_post_json,
+    reconcile_reaction_counters,
+    remove_the_reaction_json,
+    search_posts_json,
+    unfollow_user_json,
+    view_post_json,
+)
+from tests.constants import PLANS_EMAIL, PLANS_EMAIL_2, USERNAME, USERNAME_2
+from tests.utils import explain, record_queries
+
+POSTS_COUNT = 200
+REACTIONS_COUNT = 100
+
+
+async def create_user(email: str, name: str) -> int:
+    async with async_session_maker() as session:
+        result = await session.execute(
+            insert(User)
+            .values(
+                email=email,
+                name=name,
+                hashed_password="-",
+                is_active=True,
+                is_superuser=False,
+                is_verified=False,
+            )
+            .returning(User.id)
+        )
+        await session.commit()
+        return result.scalar_one()
+
+
+@pytest.fixture(scope="module")
+async def seed():
+    author_id = await create_user(email=PLANS_EMAIL, name=USERNAME)
+    reader_id = await create_user(email=PLANS_EMAIL_2, name=USERNAME_2)
+
+    async with async_session_maker() as session:
+        result = await session.execute(
+            insert(post).returning(post.c.id, sort_by_parameter_order=True),
+            [
+                {"title": f"Пост #{number}", "text": "Текст", "user_id": author_id}
+                for number in range(POSTS_COUNT)
+            ],
+        )
+        post_ids = result.scalars().all()
+        await session.execute(
+            insert(user_post),
+            [
+                {"user_id": reader_id, "post_id": post_id, "like": number % 2 == 0}
+                for number, post_id in enumerate(post_ids[:REACTIONS_COUNT])
+            ],
+        )
+        await session.execute(
+            insert(follow).values(follower_id=reader_id, followee_id=author_id)
+        )
+        await session.execute(
+            update(User).where(User.id == author_id).values(followers_count=1)
+        )
+        await session.execute(
+            insert(timeline),
+            [
+                {"user_id": reader_id, "post_id": post_id, "author_id": author_id}
+                for post_id in post_ids
+            ],
+        )
+        await session.commit()
+        await reconcile_reaction_counters(session=session)
+        await session.execute(text('ANALYZE post, user_post, "user", follow, timeline'))
+        await session.commit()
+
+    yield {"author_id": author_id, "reader_id": reader_id, "post_ids": post_ids}
+
+    async with async_session_maker() as session:
+        await session.execute(delete(post).where(post.c.user_id == author_id))
+        await session.execute(delete(User).where(User.id.in_([author_id, reader_id])))
+        await session.commit()
+
+
+@pytest.fixture(autouse=True)
+def clear_post_cache():
+    post_cache.clear()
+
+
+async def check_queries(
+    statements: list, max_statements: int, indexes: Iterable[str] = ()
+) -> None:
+    assert len(statements) <= max_statements
+    used_indexes = set()
+    for statement, parameters in statements:
+        nodes = await explain(statement=statement, parameters=parameters)
+        assert all(node["Node Type"] != "Seq Scan" for node in nodes), statement
+        used_indexes.update(
+            node["Index Name"] for node in nodes if "Index Name" in node
+        )
+    assert set(indexes) <= used_indexes
+
+
+async def test_get_post_by_id(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await get_post_by_id(post_id=seed["post_ids"][0], session=session)
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_get_post_by_post_id_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await get_post_by_post_id_json(post_id=seed["post_ids"][1], session=session)
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_get_posts_by_user_id_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            page = await get_posts_by_user_id_json(
+                user_id=seed["author_id"], session=session
+            )
+            await get_posts_by_user_id_json(
+                user_id=seed["author_id"],
+                session=session,
+                cursor=page["next_cursor"],
+            )
+    await check_queries(statements, max_statements=2, indexes=["ix_post_user_id_id"])
+
+
+async def test_get_posts_etag(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await get_post_etag(post_id=seed["post_ids"][2], session=session)
+            await get_posts_etag(user_id=seed["author_id"], session=session)
+    await check_queries(
+        statements, max_statements=2, indexes=["post_pkey", "ix_post_user_id_id"]
+    )
+
+
+async def test_search_posts_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            page = await search_posts_json(query="пост", session=session, limit=10)
+            await search_posts_json(
+                query="пост",
+                session=session,
+                user_id=seed["author_id"],
+                limit=10,
+                cursor=page["next_cursor"],
+            )
+    await check_queries(statements, max_statements=2, indexes=["ix_post_search_vector"])
+
+
+async def test_create_post_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await create_post_json(
+                post_to_create=PostCreate(title="Новый пост", text="Текст"),
+                user_id=seed["author_id"],
+                session=session,
+            )
+    await check_queries(statements, max_statements=2, indexes=["post_pkey"])
+
+
+async def test_get_home_feed_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            page = await get_home_feed_json(user_id=seed["reader_id"], session=session)
+            await get_home_feed_json(
+                user_id=seed["reader_id"],
+                session=session,
+                cursor=page["next_cursor"],
+            )
+    await check_queries(statements, max_statements=2, indexes=["post_pkey"])
+
+
+async def test_get_home_feed_json_of_popular_author(seed, monkeypatch):
+    # the author has as many followers as the threshold, so their posts are
+    # merged on read instead of being read from the timeline
+    monkeypatch.setattr("src.feed.utils.TIMELINE_FANOUT_MAX_FOLLOWERS", 1)
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            page = await get_home_feed_json(user_id=seed["reader_id"], session=session)
+            await get_home_feed_json(
+                user_id=seed["reader_id"],
+                session=session,
+                cursor=page["next_cursor"],
+            )
+    await check_queries(statements, max_statements=2, indexes=["ix_post_user_id_id"])
+    for statement, parameters in statements:
+        nodes = await explain(statement=statement, parameters=parameters)
+        # posts of every merged author are read by a range of the index in
+        # its order and stopped by the page limit, without sorting them
+        scans = [
+            node["Plans"][0]
+            for node in nodes
+            if node["Node Type"] == "Limit"
+            and node["Plans"][0].get("Index Name") == "ix_post_user_id_id"
+        ]
+        assert scans, statement
+        assert all(scan["Scan Direction"] == "Backward" for scan in scans)
+
+
+async def test_unfollow_user_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await unfollow_user_json(
+                followee_id=seed["author_id"],
+                user_id=seed["reader_id"],
+                session=session,
+            )
+    await check_queries(
+        statements,
+        max_statements=1,
+        indexes=["user_pkey"],
+    )
+
+
+async def test_follow_user_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await follow_user_json(
+                followee_id=seed["author_id"],
+                user_id=seed["reader_id"],
+                session=session,
+            )
+    await check_queries(
+        statements, max_statements=2, indexes=["user_pkey", "ix_post_user_id_id"]
+    )
+
+
+async def test_edit_post_json(seed):
+    post_update = PostUpdate(
+        id=seed["post_ids"][2], title="Новый загаловок", text="Новый текст"
+    )
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await edit_post_json(
+                post_update=post_update, user_id=seed["author_id"], session=session
+            )
+    await check_queries(statements, max_statements=2, indexes=["post_pkey"])
+
+
+async def test_view_post_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await view_post_json(
+                post_id=seed["post_ids"][3], user_id=seed["reader_id"], session=session
+            )
+    await check_queries(statements, max_statements=2, indexes=["post_pkey"])
+
+
+async def test_like_post_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await like_post_json(
+                post_id=seed["post_ids"][-1], user_id=seed["reader_id"], session=session
+            )
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_dislike_post_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await dislike_post_json(
+                post_id=seed["post_ids"][-1], user_id=seed["reader_id"], session=session
+            )
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_remove_the_reaction_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await remove_the_reaction_json(
+                post_id=seed["post_ids"][-1], user_id=seed["reader_id"], session=session
+            )
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_apply_reactions_json(seed):
+    operations = [
+        ReactionOperation(post_id=post_id, action="like")
+        for post_id in seed["post_ids"][-10:]
+    ] + [ReactionOperation(post_id=seed["post_ids"][0], action="remove")]
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await apply_reactions_json(
+                operations=operations, user_id=seed["reader_id"], session=session
+            )
+    await check_queries(statements, max_statements=2, indexes=["post_pkey"])
+
+
+async def test_refresh_trending_posts(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await TrendingPosts(size=10).refresh(session=session)
+    await check_queries(statements, max_statements=1, indexes=["ix_post_trend_rank"])
+
+
+async def test_get_all_user_post_by_post_id(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await get_all_user_post_by_post_id(
+                post_id=seed["post_ids"][0], session=session
+            )
+    await check_queries(statements, max_statements=1, indexes=["ix_user_post_post_id"])
+
+
+async def test_get_likes_by_post_id_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await get_likes_by_post_id_json(
+                post_id=seed["post_ids"][0], session=session
+            )
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_get_likes_by_post_ids_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await get_likes_by_post_ids_json(
+                post_ids=seed["post_ids"][:50], session=session
+            )
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_reconcile_reaction_counters(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await reconcile_reaction_counters(
+                session=session, post_ids=seed["post_ids"][:10]
+            )
+    await check_queries(
+        statements, max_statements=1, indexes=["post_pkey", "ix_user_post_post_id"]
+    )
+
+
+async def test_delete_post_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await delete_post_json(
+                post_id=seed["post_ids"][0], user_id=seed["author_id"], session=session
+            )
+    # reactions and timeline entries are deleted by the foreign keys
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_delete_posts_json(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            await delete_posts_json(
+                post_ids=seed["post_ids"][4:14],
+                user_id=seed["author_id"],
+                session=session,
+            )
+    await check_queries(statements, max_statements=1, indexes=["post_pkey"])
+
+
+async def test_get_user_by_email(seed):
+    with record_queries() as statements:
+        async with async_session_maker() as session:
+            user_db = SQLAlchemyUserDatabase(session, User)
+            await user_db.get_by_email(PLANS_EMAIL.upper())
+    await check_queries(statements, max_statements=1, indexes=["ix_user_email_lower"])
@@ -0,0 +1,101 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from src.config import parse_sample_rates
+from src.utils import LogFilter, log_format, logger
+
+
+@contextmanager
+def capture_logs(
+    log_filter: LogFilter, dropped_repeats: Optional[list] = None
+) -> Iterator[List[str]]:
+    messages = []
+
+    def sink(message) -> None:
+        messages.append(message.record["message"])
+        if dropped_repeats is not None:
+            dropped_repeats.append(message.record["extra"].get("dropped_repeats"))
+
+    handler_id = logger.add(sink, level="DEBUG", filter=log_filter)
+    try:
+        yield messages
+    finally:
+        logger.remove(handler_id)
+
+
+def test_sampling():
+    log_filter = LogFilter(sample_rates={"DEBUG": 0, "INFO": 1})
+    with capture_logs(log_filter) as messages:
+        logger.debug("Отладка")
+        logger.info("Информация")
+        logger.warning("Предупреждение")
+    assert messages == ["Информация", "Предупреждение"]
+
+
+def test_error_rate_limit():
+    log_filter = LogFilter(error_rate_limit=2, error_rate_window=0.05)
+    dropped_repeats = []
+    with capture_logs(log_filter, dropped_repeats) as messages:
+        for _ in range(5):
+            logger.error("Ошибка")
+        logger.error("Другая ошибка")
+        time.sleep(0.06)
+        logger.error("Ошибка")
+    assert messages == ["Ошибка", "Ошибка", "Другая ошибка", "Ошибка"]
+    assert dropped_repeats == [None, None, None, 3]
+
+
+def test_error_rate_limit_keeps_message_of_other_sinks():
+    log_filter = LogFilter(error_rate_limit=1, error_rate_window=0.05)
+    other_messages = []
+    handler_id = logger.add(
+        lambda message: other_messages.append(message.record["message"]),
+        level="DEBUG",
+    )
+    try:
+        with capture_logs(log_filter) as messages:
+            for _ in range(3):
+                logger.error("Ошибка")
+            time.sleep(0.06)
+            for _ in range(2):
+                logger.error("Ошибка")
+    finally:
+        logger.remove(handler_id)
+    assert messages == ["Ошибка", "Ошибка"]
+    assert other_messages == ["Ошибка"] * 5
+
+
+def test_log_format():
+    lines = []
+    handler_id = logger.add(lines.append, format=log_format)
+    try:
+        logger.bind(dropped_repeats=3).error("Ошибка")
+        logger.error("Ошибка")
+    finally:
+        logger.remove(handler_id)
+    assert lines[0].endswith("|\tERROR\t|\tОшибка (повторов пропущено: 3)\n")
+    assert lines[1].endswith("|\tERROR\t|\tОшибка\n")
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("debug=0.01, INFO=0.1") == {"DEBUG": 0.01, "INFO": 0.1}
+    assert parse_sample_rates("") == {}
+    assert parse_sample_rates("DEBUG,INFO=often,=0.5,WARNING=0.5") == {"WARNING": 0.5}
+
+
+def test_error_rate_limit_disabled():
+    log_filter = LogFilter(error_rate_limit=0)
+    with capture_logs(log_filter) as messages:
+        for _ in range(5):
+            logger.error("Ошибка")
+    assert len(messages) == 5
+
+
+def test_sinks_are_queued_and_filtered():
+    handlers = logger._core.handlers
+    # the default synchronous stderr sink is replaced
+    assert 0 not in handlers
+    for handler in handlers.values():
+        assert handler._enqueue
+        assert isinstance(handler._filter, LogFilter)
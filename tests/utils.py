@@ -1,47 +1,88 @@
-from httpx import AsyncClient
-from sqlalchemy import delete, select
-
-from src.auth.models import User
-from src.database import async_session_maker
-
-
-async def get_all_users():
-    async with async_session_maker() as session:
-        statement = select(User)
-        data = await session.execute(statement)
-        return data.all()
-
-
-async def get_user(email: str):
-    async with async_session_maker() as session:
-        statement = select(User).where(User.email == email)
-        data = await session.execute(statement)
-        return data.all()
-
-
-async def delete_all_users():
-    async with async_session_maker() as session:
-        statement = delete(User)
-        await session.execute(statement)
-        await session.commit()
-
-
-async def delete_user(email: str):
-    async with async_session_maker() as session:
-        statement = delete(User).where(User.email == email)
-        await session.execute(statement)
-        await session.commit()
-
-
-async def register(ac: AsyncClient, email: str, username: str, password: str):
-    return await ac.post(
-        "auth/register",
-        json={
-            "email": email,
-            "password": password,
-            "is_active": True,
-            "is_superuser": False,
-            "is_verified": False,
-            "name": username,
-        },
-    )
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Tuple
+
+from httpx import AsyncClient
+from sqlalchemy import delete, event, select
+
+from src.auth.models import User
+from src.database import async_session_maker, engine
+
+
+async def get_all_users():
+    async with async_session_maker() as session:
+        statement = select(User)
+        data = await session.execute(statement)
+        return data.all()
+
+
+async def get_user(email: str):
+    async with async_session_maker() as session:
+        statement = select(User).where(User.email == email)
+        data = await session.execute(statement)
+        return data.all()
+
+
+async def delete_all_users():
+    async with async_session_maker() as session:
+        statement = delete(User)
+        await session.execute(statement)
+        await session.commit()
+
+
+async def delete_user(email: str):
+    async with async_session_maker() as session:
+        statement = delete(User).where(User.email == email)
+        await session.execute(statement)
+        await session.commit()
+
+
+async def register(ac: AsyncClient, email: str, username: str, password: str):
+    return await ac.post(
+        "auth/register",
+        json={
+            "email": email,
+            "password": password,
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": False,
+            "name": username,
+        },
+    )
+
+
+async def login(ac: AsyncClient, email: str, password: str):
+    return await ac.post(
+        "auth/jwt/login",
+        data={"username": email, "password": password},
+    )
+
+
+@contextmanager
+def record_queries() -> Iterator[List[Tuple[str, Any]]]:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def explain(statement: str, parameters: Any) -> List[dict]:
+    """Returns the plan nodes of the statement with sequential scans disabled."""
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql("SET enable_seqscan = off")
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        )
+        plan = result.scalar_one()[0]["Plan"]
+    nodes = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get("Plans", []))
+    return nodes